@@ -77,6 +77,17 @@ CREATE TABLE attendance (
     FOREIGN KEY (Roll_no) REFERENCES student(Roll_no) ON DELETE CASCADE
 );
 
+-- 10. Face Embeddings (written by training, cached locally by every classroom PC)
+CREATE TABLE face_embedding (
+    Roll_no VARCHAR(20) PRIMARY KEY,
+    Dim SMALLINT NOT NULL,               -- 128 for dlib encodings
+    Encodings MEDIUMBLOB NOT NULL,       -- count x Dim little-endian float32, one row per photo or template
+    Checksum INT UNSIGNED NOT NULL,      -- CRC32 of Encodings, so training only rewrites students that changed
+    Updated_At TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+    INDEX (Updated_At),
+    FOREIGN KEY (Roll_no) REFERENCES student(Roll_no) ON DELETE CASCADE
+);
+
 INSERT INTO section (Name, Semester, Department)
 VALUES ('SEA', '4th', 'Computer Science');
 INSERT INTO section (Name, Semester, Department)
@@ -5,7 +5,9 @@ import cv2
 import os
 import re
 from datetime import datetime
+import face_recognition
 from db_connection import DatabaseConnection
+from face_trainer import record_face_box
 from back_button import create_back_button
 from Dash import show_main
 
@@ -530,6 +532,13 @@ def main(page: ft.Page):
                 filename = os.path.join(save_path, f"{roll_number}_{count}.jpg")
                 cv2.imwrite(filename, square_img)
                 logging.debug(f"Saved {filename}")
+                # Recording the face box now spares training a full detection pass on this photo
+                boxes = face_recognition.face_locations(cv2.cvtColor(square_img, cv2.COLOR_BGR2RGB))
+                if len(boxes) == 1:
+                    record_face_box(save_path, os.path.basename(filename), boxes[0])
+                else:
+                    record_face_box(save_path, os.path.basename(filename), None)  # A retake must not keep an old box
+                    logging.warning(f"{len(boxes)} faces found in {filename}; training will detect it again")
                 count += 1
 
             elif key == ord('q'):
@@ -0,0 +1,116 @@
+import os
+import threading
+import numpy as np
+import zlib
+import logging
+
+logging.basicConfig(level=logging.DEBUG, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Constants
+ANN_INDEX_FILE = "EncodeFile.ivf.npz"
+ANN_MIN_GALLERY = 2000  # Below this size brute force is as fast as the index
+DEFAULT_NPROBE = 8
+KMEANS_ITERATIONS = 15
+
+def gallery_checksum(gallery):
+    """CRC32 of the float32 gallery bytes, used to detect an index built for a different gallery."""
+    return zlib.crc32(np.ascontiguousarray(gallery, dtype=np.float32).tobytes())
+
+def _squared_distances(a, b, b_sq_norms):
+    sq = np.einsum("ij,ij->i", a, a)[:, None] + b_sq_norms[None, :] - 2.0 * (a @ b.T)
+    np.maximum(sq, 0.0, out=sq)
+    return sq
+
+def _kmeans(gallery, n_lists, iterations, seed):
+    """Plain Lloyd k-means; empty clusters are re-seeded with the worst-fitting points."""
+    rng = np.random.default_rng(seed)
+    centroids = gallery[rng.choice(len(gallery), n_lists, replace=False)].copy()
+    assignment = np.zeros(len(gallery), dtype=np.int32)
+    for _ in range(iterations):
+        sq = _squared_distances(gallery, centroids, np.einsum("ij,ij->i", centroids, centroids))
+        assignment = np.argmin(sq, axis=1).astype(np.int32)
+        counts = np.bincount(assignment, minlength=n_lists)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, gallery)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            worst = np.argsort(sq[np.arange(len(gallery)), assignment])[::-1][:len(empty)]
+            centroids[empty] = gallery[worst]
+    return centroids, assignment
+
+class IVFIndex:
+    """Inverted-file index: the gallery is partitioned by k-means and a query only scans the nearest lists."""
+
+    def __init__(self, centroids, order, offsets, size, checksum, nprobe=DEFAULT_NPROBE):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.centroid_sq_norms = np.einsum("ij,ij->i", self.centroids, self.centroids)
+        self.order = order  # Gallery row ids grouped by list
+        self.offsets = offsets  # List l holds order[offsets[l]:offsets[l + 1]]
+        self.size = size
+        self.checksum = checksum
+        self.nprobe = nprobe
+
+    @classmethod
+    def build(cls, gallery, n_lists=None, iterations=KMEANS_ITERATIONS, seed=0, nprobe=DEFAULT_NPROBE):
+        """Cluster the gallery into roughly sqrt(N) inverted lists."""
+        gallery = np.ascontiguousarray(gallery, dtype=np.float32)
+        if n_lists is None:
+            n_lists = int(np.sqrt(len(gallery)))
+        n_lists = max(1, min(n_lists, len(gallery)))
+        logging.debug(f"Building IVF index with {n_lists} lists over {len(gallery)} encodings")
+        centroids, assignment = _kmeans(gallery, n_lists, iterations, seed)
+        order = np.argsort(assignment, kind="stable").astype(np.int64)
+        offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(assignment, minlength=n_lists))
+        return cls(centroids, order, offsets, len(gallery), gallery_checksum(gallery), nprobe)
+
+    def save(self, path):
+        # Renamed over path, so a session never loads a half-written index; one temp file per writer
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as file:
+            np.savez(
+                file,
+                centroids=self.centroids,
+                order=self.order,
+                offsets=self.offsets,
+                size=np.int64(self.size),
+                checksum=np.int64(self.checksum),
+            )
+        os.replace(tmp_path, path)
+        logging.debug(f"Saved IVF index to {path}")
+
+    @classmethod
+    def load(cls, path, nprobe=DEFAULT_NPROBE):
+        with np.load(path) as data:
+            return cls(
+                data["centroids"],
+                data["order"],
+                data["offsets"],
+                int(data["size"]),
+                int(data["checksum"]),
+                nprobe,
+            )
+
+    def matches(self, gallery):
+        """True if this index was built for exactly this gallery."""
+        return self.size == len(gallery) and self.checksum == gallery_checksum(gallery)
+
+    def search(self, gallery, sq_norms, queries, nprobe=None):
+        """Return (best_indices, best_distances) per query by scanning only the nprobe closest lists."""
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        queries = np.asarray(queries, dtype=np.float32)
+        coarse = _squared_distances(queries, self.centroids, self.centroid_sq_norms)
+        probes = np.argpartition(coarse, nprobe - 1, axis=1)[:, :nprobe]
+        best_indices = np.empty(len(queries), dtype=np.intp)
+        best_distances = np.empty(len(queries), dtype=np.float32)
+        for i, lists in enumerate(probes):
+            candidates = np.concatenate([self.order[self.offsets[l]:self.offsets[l + 1]] for l in lists])
+            if len(candidates) == 0:
+                candidates = np.arange(len(gallery))
+            sq = _squared_distances(queries[i:i + 1], gallery[candidates], sq_norms[candidates])[0]
+            j = np.argmin(sq)
+            best_indices[i] = candidates[j]
+            best_distances[i] = np.sqrt(sq[j])
+        return best_indices, best_distances
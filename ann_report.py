@@ -0,0 +1,91 @@
+import argparse
+import json
+import time
+import logging
+import numpy as np
+from ann_index import IVFIndex, DEFAULT_NPROBE
+from face_matcher import FaceMatcher
+
+ENCODE_FILE = "EncodeFile.npy"
+MATCH_THRESHOLD = 0.4  # Same cut-off the marking loop uses
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q) * 1000.0)
+
+def time_queries(search, queries):
+    """Run one query at a time, as the camera loop does for a single face, and return (results, latencies)."""
+    indices = np.empty(len(queries), dtype=np.intp)
+    distances = np.empty(len(queries), dtype=np.float32)
+    latencies = np.empty(len(queries))
+    for i in range(len(queries)):
+        start = time.perf_counter()
+        idx, dist = search(queries[i:i + 1])
+        latencies[i] = time.perf_counter() - start
+        indices[i], distances[i] = idx[0], dist[0]
+    return indices, distances, latencies
+
+def run_report(encode_file, nprobes, n_lists, n_queries, noise, seed):
+    matcher = FaceMatcher.from_file(encode_file)
+    rng = np.random.default_rng(seed)
+
+    # Queries are gallery encodings with a small perturbation, standing in for fresh camera captures
+    rows = rng.choice(len(matcher), min(n_queries, len(matcher)), replace=False)
+    queries = matcher.gallery[rows] + rng.normal(0.0, noise, (len(rows), matcher.gallery.shape[1])).astype(np.float32)
+
+    build_start = time.perf_counter()
+    index = IVFIndex.build(matcher.gallery, n_lists=n_lists, seed=seed)
+    build_seconds = time.perf_counter() - build_start
+
+    exact_idx, exact_dist, exact_lat = time_queries(lambda q: matcher.match(q, exact=True), queries)
+    exact_ids = np.array(matcher.roll_numbers)[exact_idx]
+    exact_accept = exact_dist < MATCH_THRESHOLD
+
+    report = {
+        "gallery_size": len(matcher),
+        "queries": len(queries),
+        "lists": len(index.centroids),
+        "build_seconds": build_seconds,
+        "exact": {"p50_ms": percentile_ms(exact_lat, 50), "p95_ms": percentile_ms(exact_lat, 95)},
+        "ann": [],
+    }
+    for nprobe in nprobes:
+        ann_idx, ann_dist, ann_lat = time_queries(
+            lambda q: index.search(matcher.gallery, matcher.sq_norms, q, nprobe=nprobe), queries
+        )
+        ann_ids = np.array(matcher.roll_numbers)[ann_idx]
+        ann_accept = ann_dist < MATCH_THRESHOLD
+        report["ann"].append({
+            "nprobe": nprobe,
+            "recall_at_1": float(np.mean(ann_idx == exact_idx)),
+            "identity_agreement": float(np.mean((ann_ids == exact_ids) & (ann_accept == exact_accept))),
+            "p50_ms": percentile_ms(ann_lat, 50),
+            "p95_ms": percentile_ms(ann_lat, 95),
+        })
+    return report
+
+def print_report(report):
+    print(f"Gallery: {report['gallery_size']} encodings, {report['lists']} lists, "
+          f"built in {report['build_seconds']:.2f}s, {report['queries']} queries")
+    print(f"{'search':>12} {'recall@1':>9} {'same id':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    print(f"{'exact':>12} {1.0:>9.3f} {1.0:>8.3f} {report['exact']['p50_ms']:>8.3f} {report['exact']['p95_ms']:>8.3f}")
+    for row in report["ann"]:
+        print(f"{'nprobe=' + str(row['nprobe']):>12} {row['recall_at_1']:>9.3f} {row['identity_agreement']:>8.3f} "
+              f"{row['p50_ms']:>8.3f} {row['p95_ms']:>8.3f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the IVF index against brute-force search on the real gallery.")
+    parser.add_argument("--encode-file", default=ENCODE_FILE)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, DEFAULT_NPROBE, 16])
+    parser.add_argument("--lists", type=int, default=None, help="Number of inverted lists (default sqrt(N))")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--noise", type=float, default=0.02, help="Std-dev of the perturbation added to query encodings")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the report to this JSON file")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    result = run_report(args.encode_file, args.nprobe, args.lists, args.queries, args.noise, args.seed)
+    print_report(result)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
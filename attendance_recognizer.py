@@ -0,0 +1,75 @@
+import logging
+from face_matcher import MATCH_THRESHOLD
+from face_tracker import UNKNOWN_RETRY_SECONDS
+
+logging.basicConfig(level=logging.DEBUG, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Constants
+CANDIDATE_THRESHOLD = 0.6  # Loose cut-off for a frame's vote; the vote decision applies MATCH_THRESHOLD
+
+class AttendanceRecognizer:
+    """Turns detection results into tracks, votes and marks for one camera session.
+
+    Called with each (frame_id, face_locations, face_encodings) from the RecognitionPipeline.
+    on_mark(roll_no, name) is called once for every student newly settled on a track who is not
+    yet marked in the session. With other_matcher (the full gallery), faces settled as unknown are
+    checked against the other sections and labelled "not in section".
+    """
+
+    def __init__(self, session, section_matcher, tracker, on_mark, other_matcher=None,
+                 candidate_threshold=CANDIDATE_THRESHOLD, match_threshold=MATCH_THRESHOLD):
+        self.session = session
+        self.section_matcher = section_matcher
+        self.tracker = tracker
+        self.on_mark = on_mark
+        self.other_matcher = other_matcher
+        self.candidate_threshold = candidate_threshold
+        self.match_threshold = match_threshold
+        self.matched = 0  # Encodings looked up in the gallery
+
+    def swap_gallery(self, section_matcher, other_matcher=None):
+        """Match against a retrained gallery from the next detection result on.
+
+        Votes already cast are roll numbers, so tracks keep their progress across the swap. The old
+        matchers (and the memory map behind them) are released once the caller drops them too.
+        """
+        self.section_matcher = section_matcher
+        self.other_matcher = other_matcher
+
+    def __call__(self, frame_id, face_locations, face_encodings):
+        """Update the tracks with one detection result, vote on new encodings and mark settled students."""
+        pending = self.tracker.update(face_locations, face_encodings)
+        if not pending:
+            return
+        encodings = [track.encoding for track in pending]
+        best_indices, best_distances = self.section_matcher.match(encodings)
+        self.matched += len(encodings)
+
+        for i, track in enumerate(pending):
+            track.encoding = None
+            # Every encoding votes for its nearest student; a mark needs several agreeing votes
+            candidate = None
+            if best_distances[i] < self.candidate_threshold:
+                candidate = self.section_matcher.roll_numbers[best_indices[i]]
+            track.votes.add(frame_id, candidate, best_distances[i])
+            decision, roll_no = track.votes.decide(self.match_threshold)
+
+            if decision == "student":
+                logging.debug(f"Match confirmed: Roll No {roll_no} on track {track.track_id}")
+                name = self.session.name_for(roll_no)
+                track.confirm(roll_no, f"ID: {roll_no} ({name})", (0, 255, 0))
+                if not self.session.is_marked(roll_no):
+                    logging.debug(f"Marking attendance for Roll No {roll_no}")
+                    self.on_mark(roll_no, name)
+            elif decision == "unknown":
+                # Settled tracks are not encoded until the retry, so an unknown face costs little more
+                track.confirm(None, "Unknown", (0, 0, 255), retry_after=UNKNOWN_RETRY_SECONDS)
+                if self.other_matcher is not None:
+                    other_indices, other_distances = self.other_matcher.match(encodings[i:i + 1])
+                    if other_distances[0] < self.match_threshold:
+                        roll_no = self.other_matcher.roll_numbers[other_indices[0]]
+                        logging.debug(f"Roll No {roll_no} not in section {self.session.section_id}")
+                        track.confirm(roll_no, f"ID: {roll_no} (not in section)", (0, 165, 255),
+                                      retry_after=UNKNOWN_RETRY_SECONDS)
+            elif candidate is not None:
+                track.label, track.color = "Verifying...", (0, 255, 255)
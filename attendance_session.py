@@ -0,0 +1,69 @@
+import logging
+from datetime import datetime, date
+from db_connection import DatabaseConnection
+from attendance_writer import AttendanceWriter
+
+logging.basicConfig(level=logging.DEBUG, format="%(asctime)s - %(levelname)s - %(message)s")
+
+class AttendanceSession:
+    def __init__(self, teacher_id, course_id, section_id, on_write_error=None, attendance_date=None):
+        """Roster and the day's marks for one teacher/course/section, loaded once per camera session.
+
+        attendance_date defaults to today. on_write_error(roll_numbers, err) is called from the
+        writer thread when a batch fails to save.
+        """
+        self.teacher_id = teacher_id
+        self.course_id = course_id
+        self.section_id = section_id
+        self.attendance_date = attendance_date or date.today()
+        self.roster = {}  # Roll_no -> Full_Name
+        self.marked = set()  # Roll_no already marked on attendance_date (saved or queued)
+        self.on_write_error = on_write_error
+        self.writer = None
+
+    def load(self, **writer_options):
+        """Fetch the section roster and the day's marks in one connection. Raises mysql.connector.Error."""
+        logging.debug(f"Loading session for CourseID {self.course_id}, SectionID {self.section_id}")
+        with DatabaseConnection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT Roll_no, Full_Name FROM student WHERE SectionID = %s", (self.section_id,))
+            self.roster = {roll_no: name for roll_no, name in cursor.fetchall()}
+            cursor.execute("""
+                SELECT DISTINCT Roll_no FROM attendance
+                WHERE CourseID=%s
+                AND SectionID=%s
+                AND Teacher_ID=%s
+                AND DATE(Attendance_Date)=%s
+            """, (self.course_id, self.section_id, self.teacher_id, self.attendance_date))
+            self.marked = {row[0] for row in cursor.fetchall()}
+        logging.debug(f"Session loaded: {len(self.roster)} students, {len(self.marked)} already marked")
+        self.writer = AttendanceWriter(on_error=self._write_failed, **writer_options).start()
+        return self
+
+    def name_for(self, roll_no):
+        return self.roster.get(roll_no, "Unknown")
+
+    def is_marked(self, roll_no):
+        return roll_no in self.marked
+
+    def mark(self, roll_no, status="Present", when=None):
+        """Queue one attendance row for the background writer and remember it immediately.
+
+        when is the time of the mark on attendance_date (default: now).
+        """
+        when = when or datetime.now().time()
+        self.writer.submit((self.teacher_id, self.course_id, self.section_id, roll_no, self.attendance_date, when, status))
+        self.marked.add(roll_no)
+        logging.info(f"Queued {status} for Roll No: {roll_no}")
+
+    def close(self):
+        """Drain the write queue so no queued marks are lost when the session ends."""
+        if self.writer is not None:
+            self.writer.close()
+
+    def _write_failed(self, rows, err):
+        # The writer has already retried these; forget them so a student who leaves and is tracked again is re-marked
+        roll_numbers = [row[3] for row in rows]
+        self.marked.difference_update(roll_numbers)
+        if self.on_write_error:
+            self.on_write_error(roll_numbers, err)
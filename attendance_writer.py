@@ -0,0 +1,120 @@
+import queue
+import threading
+import time
+import logging
+import mysql.connector
+from db_connection import DatabaseConnection
+from stage_metrics import NULL_METRICS
+
+logging.basicConfig(level=logging.DEBUG, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Constants
+BATCH_SIZE = 20  # Flush after this many queued marks
+FLUSH_INTERVAL_MS = 500  # ...or after this long, whichever comes first
+RETRY_DELAYS = (1, 2, 5, 10, 30)  # Seconds before each retry of a failed batch; then it is reported as lost
+INSERT_QUERY = """
+    INSERT INTO attendance (Teacher_ID, CourseID, SectionID, Roll_no, Attendance_Date, Attendance_Time, Status)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+"""
+
+_STOP = object()
+
+class AttendanceWriter:
+    def __init__(self, batch_size=BATCH_SIZE, flush_interval_ms=FLUSH_INTERVAL_MS, on_error=None, metrics=NULL_METRICS,
+                 retry_delays=RETRY_DELAYS):
+        """Background writer that batches attendance rows off the camera thread.
+
+        A failed batch is retried after each of retry_delays and once more on close; confirmed faces
+        are not recognized again, so this is the only second chance a mark gets. on_error(rows, err)
+        is called from the writer thread with the rows of a batch that could not be saved.
+        """
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.retry_delays = retry_delays
+        self.on_error = on_error
+        self.metrics = metrics
+        self.written = 0
+        self.failed = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="attendance-writer", daemon=True)
+        self._closed = False
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def submit(self, row):
+        """Queue one row in INSERT_QUERY column order; never blocks on the database."""
+        if self._closed:
+            raise RuntimeError("AttendanceWriter is closed")
+        self._queue.put(row)
+
+    def close(self, timeout=None):
+        """Stop accepting rows, flush everything still queued and wait for the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        logging.debug(f"Attendance writer closed: {self.written} written, {self.failed} failed")
+
+    def _run(self):
+        pending = []
+        deadline = None
+        retry_rows = []  # Rows of failed batches, written again at retry_at
+        retry_at = None
+        attempts = 0
+        while True:
+            wake = [t for t in (deadline, retry_at) if t is not None]
+            timeout = max(0.0, min(wake) - time.monotonic()) if wake else None
+            try:
+                row = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                row = None
+            if row is _STOP:
+                # Everything submitted before close() is already ahead of the sentinel
+                self._flush(retry_rows + pending, report=True)
+                return
+            if row is not None:
+                pending.append(row)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+            if pending and (len(pending) >= self.batch_size or time.monotonic() >= deadline):
+                if not self._flush(pending, report=not self.retry_delays):
+                    retry_rows += pending
+                    if retry_at is None:
+                        retry_at = time.monotonic() + self.retry_delays[0]
+                pending = []
+                deadline = None
+            if retry_rows and time.monotonic() >= retry_at:
+                attempts += 1
+                last_try = attempts >= len(self.retry_delays)
+                if self._flush(retry_rows, report=last_try) or last_try:
+                    retry_rows, retry_at, attempts = [], None, 0
+                else:
+                    retry_at = time.monotonic() + self.retry_delays[attempts]
+
+    def _flush(self, rows, report=True):
+        """Write one batch; returns False on a database error. report passes the failure to on_error."""
+        if not rows:
+            return True
+        logging.debug(f"Flushing {len(rows)} attendance rows")
+        try:
+            with self.metrics.stage("db"), DatabaseConnection() as conn:
+                cursor = conn.cursor()
+                cursor.executemany(INSERT_QUERY, rows)
+                conn.commit()
+            self.written += len(rows)
+            return True
+        except mysql.connector.Error as err:
+            if not report:
+                logging.warning(f"Database error while writing attendance batch, will retry: {err}")
+                return False
+            logging.error(f"Database error while writing attendance batch: {err}")
+            self.failed += len(rows)
+            if self.on_error:
+                try:
+                    self.on_error(rows, err)
+                except Exception as e:
+                    logging.error(f"Attendance writer error callback failed: {str(e)}")
+            return False
@@ -0,0 +1,160 @@
+import io
+import os
+import time
+import math
+import atexit
+import wave
+import array
+import platform
+import threading
+import subprocess
+import logging
+
+logging.basicConfig(level=logging.DEBUG, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Constants
+SOUND_FILE = "beep.wav"
+BEEP_HZ = 1000  # Synthesized beep when SOUND_FILE is missing, same as the old winsound.Beep(1000, 200)
+BEEP_MS = 200
+SAMPLE_RATE = 22050
+COALESCE_SECONDS = 0.3  # Marks arriving this close together share one beep
+TTS_RATE = 150
+
+def _synthesize_beep():
+    """Mono 16-bit PCM sine beep as (pcm_bytes, channels, sample_width, rate)."""
+    samples = array.array("h", (
+        int(12000 * math.sin(2 * math.pi * BEEP_HZ * i / SAMPLE_RATE))
+        for i in range(SAMPLE_RATE * BEEP_MS // 1000)
+    ))
+    return samples.tobytes(), 1, 2, SAMPLE_RATE
+
+def load_sound(path=SOUND_FILE):
+    """Decode the beep once: (pcm_bytes, channels, sample_width, rate) from path, or a synthesized beep."""
+    if os.path.exists(path):
+        try:
+            with wave.open(path, 'rb') as wav:
+                return wav.readframes(wav.getnframes()), wav.getnchannels(), wav.getsampwidth(), wav.getframerate()
+        except (wave.Error, EOFError) as e:
+            logging.warning(f"Could not decode {path}, using a synthesized beep: {str(e)}")
+    return _synthesize_beep()
+
+def _wav_bytes(pcm, channels, sample_width, rate):
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(sample_width)
+        wav.setframerate(rate)
+        wav.writeframes(pcm)
+    return buffer.getvalue()
+
+class AudioFeedback:
+    """One background thread for all attendance sounds.
+
+    notify_marked() never blocks. Marks that arrive while a sound is pending are coalesced into
+    a single beep, optionally followed by a spoken name or count. The thread, the decoded sound
+    and the TTS engine are only created on first use.
+    """
+
+    def __init__(self, sound_file=SOUND_FILE, announce=False):
+        self.sound_file = sound_file
+        self.announce = announce
+        self._cond = threading.Condition()
+        self._pending = []
+        self._thread = None
+        self._closed = False
+        self._player = None  # Long-lived aplay process on Linux
+        self._tts_engine = None
+
+    def notify_marked(self, name=None):
+        with self._cond:
+            if self._closed:
+                return
+            self._pending.append(name)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="audio-feedback", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        if self._player is not None:
+            try:
+                self._player.stdin.close()
+                self._player.wait(timeout=2)
+            except (OSError, subprocess.TimeoutExpired):
+                self._player.kill()  # Still playing or stuck; the beep is not worth waiting for
+
+    def _run(self):
+        self._prepare()
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._closed)
+                if self._closed:
+                    return
+                # Let the rest of a burst arrive before taking it as one event; every mark notifies,
+                # so wait out a fixed deadline instead of returning at the next one
+                deadline = time.monotonic() + COALESCE_SECONDS
+                while not self._closed and (remaining := deadline - time.monotonic()) > 0:
+                    self._cond.wait(remaining)
+                names, self._pending = self._pending, []
+            logging.debug(f"Audio feedback for {len(names)} mark(s)")
+            self._play_beep()
+            if self.announce:
+                if len(names) == 1 and names[0]:
+                    self._speak(f"Attendance marked for {names[0]}")
+                else:
+                    self._speak(f"{len(names)} students marked")
+
+    def _prepare(self):
+        pcm, channels, sample_width, rate = load_sound(self.sound_file)
+        self._pcm = pcm
+        self._wav = _wav_bytes(pcm, channels, sample_width, rate)
+        if platform.system() == "Linux":
+            try:
+                # Raw PCM is streamed into one aplay for the whole app instead of one process per beep
+                self._player = subprocess.Popen(
+                    ["aplay", "-q", "-t", "raw", "-f", f"S{8 * sample_width}_LE" if sample_width > 1 else "U8",
+                     "-c", str(channels), "-r", str(rate)],
+                    stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                )
+            except OSError as e:
+                logging.warning(f"aplay not available, attendance beeps disabled: {str(e)}")
+
+    def _play_beep(self):
+        try:
+            if platform.system() == "Windows":
+                import winsound
+                winsound.PlaySound(self._wav, winsound.SND_MEMORY)
+            elif self._player is not None:
+                self._player.stdin.write(self._pcm)
+                self._player.stdin.flush()
+        except Exception as e:
+            logging.error(f"Failed to play sound: {str(e)}")
+
+    def _speak(self, message):
+        try:
+            if self._tts_engine is None:
+                import pyttsx3
+                self._tts_engine = pyttsx3.init()
+                self._tts_engine.setProperty('rate', TTS_RATE)
+            self._tts_engine.say(message)
+            self._tts_engine.runAndWait()
+        except Exception as e:
+            logging.error(f"Failed to play TTS message: {str(e)}")
+
+_audio = None
+_audio_lock = threading.Lock()
+
+def get_audio_feedback(announce=False):
+    """Shared AudioFeedback for the app; created on first call, its thread on first mark."""
+    global _audio
+    with _audio_lock:
+        if _audio is None:
+            _audio = AudioFeedback(announce=announce)
+            atexit.register(_audio.close)  # Shuts down the aplay child with the app
+        _audio.announce = announce
+        return _audio
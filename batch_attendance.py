@@ -0,0 +1,181 @@
+import argparse
+import os
+import logging
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+import cv2
+import mysql.connector
+from attendance_session import AttendanceSession
+from face_matcher import FaceMatcher, MATCH_THRESHOLD
+from face_tracker import VOTES_NEEDED
+from recognition_pipeline import detect_and_encode, DEFAULT_WORKERS
+from detector_profiles import load_profile
+
+logging.basicConfig(level=logging.DEBUG, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Constants
+ENCODE_FILE = "EncodeFile.npy"
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+VIDEO_STRIDE = 15  # Two samples per second at 30 fps
+IMAGE_SCALE = 0.5  # Class photos are larger and their faces smaller
+FRAMES_PER_TASK = 600  # Video frames decoded by one worker task (20 s at 30 fps)
+IMAGES_PER_TASK = 8
+WRITE_BATCH_SIZE = 500
+
+def _encode(frame, profile):
+    small_frame = cv2.resize(frame, (0, 0), fx=profile.scale, fy=profile.scale) if profile.scale != 1.0 else frame
+    rgb_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+    return detect_and_encode(rgb_frame, profile=profile)[1]
+
+def encode_video_segment(path, start, stop, stride, profile):
+    """Worker task: decode frames [start, stop) of a video, encode every stride-th one.
+
+    Returns [(frame_index, encodings)] for frames with at least one face.
+    """
+    cap = cv2.VideoCapture(path)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    results = []
+    for index in range(start, stop):
+        if index % stride:
+            if not cap.grab():  # Advance without decoding the skipped frame
+                break
+            continue
+        ret, frame = cap.read()
+        if not ret:
+            break
+        encodings = _encode(frame, profile)
+        if encodings:
+            results.append((index, encodings))
+    cap.release()
+    return results
+
+def encode_image_files(paths, profile):
+    """Worker task: encode a chunk of still images. Returns [(path, encodings)]."""
+    results = []
+    for path in paths:
+        frame = cv2.imread(path)
+        if frame is None:
+            logging.warning(f"Could not load image {path}")
+            continue
+        encodings = _encode(frame, profile)
+        if encodings:
+            results.append((path, encodings))
+    return results
+
+def video_tasks(path, stride, profile):
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video {path}")
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    cap.release()
+    # Segment boundaries are multiples of the stride so sampling stays even across workers
+    span = max(stride, FRAMES_PER_TASK - FRAMES_PER_TASK % stride)
+    tasks = [(encode_video_segment, (path, start, min(start + span, total), stride, profile)) for start in range(0, total, span)]
+    logging.info(f"{path}: {total} frames at {fps:.1f} fps, {len(tasks)} segments, every {stride} frame(s)")
+    return tasks, fps
+
+def image_tasks(directory, stride, profile):
+    paths = sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )[::stride]
+    tasks = [(encode_image_files, (paths[i:i + IMAGES_PER_TASK], profile)) for i in range(0, len(paths), IMAGES_PER_TASK)]
+    logging.info(f"{directory}: {len(paths)} images, {len(tasks)} chunks")
+    return tasks
+
+def collect_hits(tasks, section_matcher, workers):
+    """Run the tasks on a process pool and count per-student matches as results arrive.
+
+    Returns {roll_no: (hits, first_key)} where first_key is the earliest frame index or path.
+    """
+    hits = defaultdict(int)
+    first_seen = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(func, *args) for func, args in tasks]
+        for done, future in enumerate(futures, start=1):
+            for key, encodings in future.result():
+                best_indices, best_distances = section_matcher.match(encodings)
+                for index, distance in zip(best_indices, best_distances):
+                    if distance < MATCH_THRESHOLD:
+                        roll_no = section_matcher.roll_numbers[index]
+                        hits[roll_no] += 1
+                        first_seen[roll_no] = min(first_seen.get(roll_no, key), key)
+            logging.debug(f"Finished task {done}/{len(futures)}")
+    return {roll_no: (count, first_seen[roll_no]) for roll_no, count in hits.items()}
+
+def run_batch(args):
+    attendance_date = datetime.strptime(args.date, "%Y-%m-%d").date()
+    start_time = datetime.strptime(args.time, "%H:%M").time() if args.time else datetime.now().time()
+
+    unsaved = []  # Roll numbers whose marks the writer gave up on
+    session = AttendanceSession(args.teacher, args.course, args.section, attendance_date=attendance_date,
+                                on_write_error=lambda roll_numbers, err: unsaved.extend(roll_numbers))
+    session.load(batch_size=WRITE_BATCH_SIZE)
+    try:
+        section_matcher = FaceMatcher.from_file(args.encode_file).subset(session.roster)
+        if len(section_matcher) == 0:
+            logging.error(f"No trained face encodings for students in section {args.section}")
+            return 1
+
+        # Same detector settings as the live loop on this machine; only the downscale may be overridden
+        profile = load_profile()
+        if args.video:
+            profile = profile._replace(scale=args.scale or profile.scale)
+            tasks, fps = video_tasks(args.video, args.stride, profile)
+        else:
+            profile = profile._replace(scale=args.scale or IMAGE_SCALE)
+            tasks, fps = image_tasks(args.images, args.stride, profile), None
+        seen = collect_hits(tasks, section_matcher, args.workers)
+
+        marked = 0
+        for roll_no, (count, first_key) in sorted(seen.items()):
+            if count < args.min_hits or session.is_marked(roll_no):
+                continue
+            when = start_time
+            if fps:  # Timestamp the mark at the student's first appearance in the recording
+                when = (datetime.combine(attendance_date, start_time) + timedelta(seconds=first_key / fps)).time()
+            logging.info(f"Present: {roll_no} ({session.name_for(roll_no)}), {count} matching frame(s)")
+            if not args.dry_run:
+                session.mark(roll_no, "Present", when=when)
+            marked += 1
+    finally:
+        session.close()  # Flushes all queued marks in bulk
+
+    if session.writer.failed:
+        logging.error(f"{session.writer.failed} marks were not saved: {', '.join(unsaved)}")
+        return 1
+    logging.info(f"{marked} students marked present, {len(session.roster) - len(session.marked)} not marked")
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mark attendance from a recorded lecture or a folder of class photos.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--video", help="Recorded lecture video file")
+    source.add_argument("--images", help="Directory of class photos")
+    parser.add_argument("--teacher", type=int, required=True, help="Teacher_ID")
+    parser.add_argument("--course", type=int, required=True, help="CourseID")
+    parser.add_argument("--section", type=int, required=True, help="SectionID")
+    parser.add_argument("--date", required=True, help="Attendance date (YYYY-MM-DD)")
+    parser.add_argument("--time", help="Lecture start time (HH:MM), default now")
+    parser.add_argument("--stride", type=int, help=f"Process every Nth video frame / image (default {VIDEO_STRIDE} video, 1 images)")
+    parser.add_argument("--scale", type=float, help=f"Detection downscale (default: detector profile for video, {IMAGE_SCALE} images)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--min-hits", type=int, default=VOTES_NEEDED,
+                        help=f"Matching frames required before a student is marked (default {VOTES_NEEDED}, as the live "
+                             "camera's votes; 1 lets a single look-alike frame mark a student)")
+    parser.add_argument("--encode-file", default=ENCODE_FILE)
+    parser.add_argument("--dry-run", action="store_true", help="Report who would be marked without writing")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.INFO)
+    if args.stride is None:
+        args.stride = VIDEO_STRIDE if args.video else 1
+    if args.stride < 1:
+        parser.error("--stride must be at least 1")
+
+    try:
+        raise SystemExit(run_batch(args))
+    except mysql.connector.Error as err:
+        logging.error(f"Database error: {err}")
+        raise SystemExit(1)
@@ -0,0 +1,405 @@
+import argparse
+import json
+import math
+import os
+import platform
+import sqlite3
+import subprocess
+import time
+import logging
+from datetime import date, datetime, time as dt_time
+import cv2
+import numpy as np
+import attendance_session
+import attendance_writer
+from attendance_session import AttendanceSession
+from attendance_recognizer import AttendanceRecognizer
+from ann_index import IVFIndex, ANN_MIN_GALLERY
+from face_matcher import FaceMatcher
+from embedding_store import load_embeddings
+from face_tracker import FaceTracker
+from motion_gate import MotionGate
+from detector_profiles import load_profile
+from preview_server import draw_overlays
+from recognition_pipeline import RecognitionPipeline, DEFAULT_WORKERS, get_worker_pool, detect_and_encode
+from stage_metrics import StageMetrics
+
+# Constants
+ENCODE_FILE = "EncodeFile.npy"
+IMAGE_DIR = "photos"
+FRAMES = 300
+FPS = 30
+RESOLUTION = "1280x720"
+SYNTHETIC_CYCLE = 30  # Distinct synthetic frames, replayed in a loop
+DRIFT_PX = 3  # Faces sway this much so the motion gate sees a live scene
+DRAIN_SECONDS = 3.0  # Wait for in-flight results after the last frame
+TEACHER_ID, COURSE_ID, SECTION_ID = 1, 1, 1
+
+SCHEMA = """
+    CREATE TABLE student (Roll_no TEXT PRIMARY KEY, Full_Name TEXT NOT NULL, SectionID INTEGER NOT NULL);
+    CREATE TABLE attendance (
+        AttendanceID INTEGER PRIMARY KEY AUTOINCREMENT,
+        Teacher_ID INTEGER, CourseID INTEGER, SectionID INTEGER, Roll_no TEXT,
+        Attendance_Date TEXT NOT NULL, Attendance_Time TEXT NOT NULL, Status TEXT NOT NULL
+    );
+"""
+
+def _sqlite_value(value):
+    # sqlite3 has no adapter for time, and its date adapter is deprecated
+    return value.isoformat() if isinstance(value, (date, datetime, dt_time)) else value
+
+class _CountingCursor:
+    def __init__(self, cursor, database):
+        self._cursor = cursor
+        self._database = database
+
+    def execute(self, query, params=()):
+        self._database.calls += 1
+        self._cursor.execute(query.replace("%s", "?"), [_sqlite_value(v) for v in params])
+
+    def executemany(self, query, rows):
+        self._database.calls += 1
+        self._cursor.executemany(query.replace("%s", "?"), [[_sqlite_value(v) for v in row] for row in rows])
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+class _CountingConnection:
+    def __init__(self, connection, database):
+        self._connection = connection
+        self._database = database
+
+    def cursor(self):
+        return _CountingCursor(self._connection.cursor(), self._database)
+
+    def commit(self):
+        self._connection.commit()
+
+class BenchDatabase:
+    """In-memory SQLite stand-in for the MySQL tables a camera session touches.
+
+    The instance is called in place of DatabaseConnection(), so every connection, query and
+    batch is counted without a server.
+    """
+
+    def __init__(self, roster):
+        self.uri = f"file:bench_{os.getpid()}_{id(self)}?mode=memory&cache=shared"
+        self._anchor = sqlite3.connect(self.uri, uri=True, check_same_thread=False)  # Keeps the database alive
+        self._anchor.executescript(SCHEMA)
+        self._anchor.executemany(
+            "INSERT INTO student (Roll_no, Full_Name, SectionID) VALUES (?, ?, ?)",
+            [(roll_no, name, SECTION_ID) for roll_no, name in roster.items()],
+        )
+        self._anchor.commit()
+        self.connections = 0
+        self.calls = 0
+
+    def __call__(self):
+        return self
+
+    def __enter__(self):
+        self.connections += 1
+        self._connection = sqlite3.connect(self.uri, uri=True, check_same_thread=False)
+        return _CountingConnection(self._connection, self)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._connection.close()
+
+    def rows_written(self):
+        return self._anchor.execute("SELECT COUNT(*) FROM attendance").fetchone()[0]
+
+    def install(self):
+        """Route the session and its writer to this database instead of MySQL."""
+        attendance_session.DatabaseConnection = self
+        attendance_writer.DatabaseConnection = self
+        return self
+
+class ReplayCapture:
+    """cv2.VideoCapture stand-in that serves frames at a fixed rate and remembers when each was grabbed."""
+
+    def __init__(self, next_frame, fps):
+        self.next_frame = next_frame
+        self.interval = 1.0 / fps if fps else 0.0
+        self.grabbed = []  # perf_counter() of each read; index frame_id - 1
+        self._next_due = None
+
+    def read(self):
+        if self.interval:
+            now = time.perf_counter()
+            if self._next_due is None:
+                self._next_due = now
+            elif self._next_due > now:
+                time.sleep(self._next_due - now)
+            self._next_due += self.interval
+        frame = self.next_frame()
+        self.grabbed.append(time.perf_counter())
+        return True, frame
+
+def parse_resolution(value):
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+def video_source(path, resolution):
+    """Frames of a recorded clip, rewinding at the end; decoding is part of the grab stage as with a camera."""
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise SystemExit(f"Could not open {path}")
+
+    def next_frame():
+        ret, frame = cap.read()
+        if not ret:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = cap.read()
+        if resolution and (frame.shape[1], frame.shape[0]) != resolution:
+            frame = cv2.resize(frame, resolution)
+        return frame
+    return next_frame
+
+def synthetic_frames(photos, resolution, cycle=SYNTHETIC_CYCLE):
+    """One enrollment photo per face laid out on a grid, drifting a few pixels from frame to frame."""
+    width, height = resolution
+    cols = math.ceil(math.sqrt(len(photos)))
+    rows = math.ceil(len(photos) / cols)
+    cell_w, cell_h = width // cols, height // rows
+    tiles = []
+    for photo in photos:
+        factor = 0.9 * min(cell_w / photo.shape[1], cell_h / photo.shape[0])
+        tiles.append(cv2.resize(photo, (int(photo.shape[1] * factor), int(photo.shape[0] * factor))))
+    frames = []
+    for t in range(cycle):
+        frame = np.full((height, width, 3), 96, dtype=np.uint8)
+        for k, tile in enumerate(tiles):
+            row, col = divmod(k, cols)
+            dx = int(round(DRIFT_PX * math.sin(2 * math.pi * t / cycle + k)))
+            x = col * cell_w + (cell_w - tile.shape[1]) // 2 + dx
+            y = row * cell_h + (cell_h - tile.shape[0]) // 2
+            x = min(max(x, 0), width - tile.shape[1])
+            frame[y:y + tile.shape[0], x:x + tile.shape[1]] = tile
+        frames.append(frame)
+    return frames
+
+def pick_students(image_dir, roll_numbers, count):
+    """First photo of up to count enrolled students that have encodings in the gallery."""
+    known = set(roll_numbers)
+    picked = {}
+    for roll_no in sorted(os.listdir(image_dir)):
+        folder = os.path.join(image_dir, roll_no)
+        if roll_no not in known or not os.path.isdir(folder):
+            continue
+        for filename in sorted(os.listdir(folder)):
+            photo = cv2.imread(os.path.join(folder, filename))
+            if photo is not None:
+                picked[roll_no] = photo
+                break
+        if len(picked) >= count:
+            break
+    return picked
+
+def pad_gallery(encodings, roll_numbers, size, seed):
+    """Grow the gallery to size with random encodings drawn from the real ones' per-dimension spread."""
+    encodings = np.asarray(encodings, dtype=np.float32)
+    missing = size - len(encodings)
+    if missing <= 0:
+        return encodings, list(roll_numbers)
+    rng = np.random.default_rng(seed)
+    synthetic = rng.normal(encodings.mean(axis=0), encodings.std(axis=0) + 1e-3, (missing, encodings.shape[1]))
+    padded_rolls = list(roll_numbers) + [f"SYN-{i:06d}" for i in range(missing)]
+    return np.vstack([encodings, synthetic.astype(np.float32)]), padded_rolls
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None  # Not available on Windows
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024.0 * 1024.0) if platform.system() == "Darwin" else rss / 1024.0
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def percentiles_ms(samples):
+    if not samples:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None}
+    values = np.asarray(samples) * 1000.0
+    return {f"p{q}_ms": float(np.percentile(values, q)) for q in (50, 95, 99)}
+
+def run_benchmark(args):
+    resolution = parse_resolution(args.resolution)
+    encode_list, roll_numbers = load_embeddings(args.encode_file)
+    in_frame = {}
+    if not args.video:
+        in_frame = pick_students(args.photos, roll_numbers, args.faces)
+        if not in_frame:
+            raise SystemExit(f"No enrolled student photos under {args.photos} match {args.encode_file}")
+    gallery, gallery_rolls = pad_gallery(encode_list, roll_numbers, args.gallery or 0, args.seed)
+    matcher = FaceMatcher(gallery, gallery_rolls)
+
+    database = BenchDatabase({roll_no: f"Student {roll_no}" for roll_no in dict.fromkeys(gallery_rolls)}).install()
+    metrics = StageMetrics()
+    session = AttendanceSession(TEACHER_ID, COURSE_ID, SECTION_ID).load(metrics=metrics)
+    section_matcher = matcher.subset(session.roster)
+    if args.ann:
+        # subset() drops any index, so build it for the matcher the recognizer actually searches
+        section_matcher.attach_index(IVFIndex.build(section_matcher.gallery, seed=args.seed))
+    setup_calls = database.calls
+
+    if args.video:
+        next_frame = video_source(args.video, resolution)
+    else:
+        frames = synthetic_frames(list(in_frame.values()), resolution)
+        frame_iter = iter(frames * (args.frames // len(frames) + 2))
+        next_frame = lambda: next(frame_iter)
+    capture = ReplayCapture(next_frame, args.fps)
+
+    # Start the workers and load the dlib models before the clock starts
+    profile = load_profile()
+    pool = get_worker_pool(args.workers)
+    warm = cv2.cvtColor(cv2.resize(next_frame(), (0, 0), fx=profile.scale, fy=profile.scale), cv2.COLOR_BGR2RGB)
+    for future in [pool.submit(detect_and_encode, warm, None, profile) for _ in range(args.workers)]:
+        future.result()
+
+    tracker = FaceTracker()
+    motion_gate = MotionGate()
+    recognizer = AttendanceRecognizer(session, section_matcher, tracker, lambda roll_no, name: session.mark(roll_no))
+    latencies = []
+
+    def consume(results):
+        for frame_id, face_locations, face_encodings in results:
+            with metrics.stage("match"):
+                recognizer(frame_id, face_locations, face_encodings)
+            latencies.append(time.perf_counter() - capture.grabbed[frame_id - 1])
+
+    pipeline = RecognitionPipeline(
+        capture, workers=args.workers, profile=profile, tracker=tracker, motion_gate=motion_gate, metrics=metrics
+    ).start()
+    started = time.perf_counter()
+    displayed = 0
+    while len(capture.grabbed) < args.frames and not pipeline.error:
+        consume(pipeline.results())
+        frame = pipeline.latest_frame(timeout=0.1)
+        if frame is None:
+            continue
+        overlays = []
+        for track in tracker.visible_tracks():
+            top, right, bottom, left = track.box
+            overlays.append(((left, top, right - left, bottom - top), track.label, track.color))
+        metrics.frame()
+        displayed += 1
+        with metrics.stage("draw"):
+            draw_overlays(frame.copy(), overlays)
+    elapsed = time.perf_counter() - started
+    pipeline.stop()
+    grabbed = len(capture.grabbed)
+    deadline = time.monotonic() + DRAIN_SECONDS
+    while time.monotonic() < deadline:
+        consume(pipeline.results())
+        time.sleep(0.05)
+    session.close()
+
+    expected = set(in_frame)
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "params": {
+            "source": args.video or "synthetic",
+            "gallery_size": len(matcher),
+            "faces_per_frame": len(in_frame) if in_frame else None,
+            "resolution": args.resolution,
+            "frames": args.frames,
+            "fps": args.fps,
+            "workers": args.workers,
+            "profile": profile.name,
+            "ann": section_matcher.index is not None and len(section_matcher) >= ANN_MIN_GALLERY,
+        },
+        "throughput": {
+            "elapsed_s": elapsed,
+            "frames_grabbed": grabbed,
+            "frames_displayed": displayed,
+            "frames_recognized": len(latencies),
+            "display_fps": displayed / elapsed,
+            "recognized_per_s": len(latencies) / elapsed,
+        },
+        "latency": percentiles_ms(latencies),  # Frame grabbed -> its result matched
+        "db": {
+            "connections": database.connections,
+            "calls": database.calls,
+            "setup_calls": setup_calls,
+            "calls_per_frame": (database.calls - setup_calls) / grabbed if grabbed else 0.0,
+            "rows_written": database.rows_written(),
+        },
+        "marking": {
+            "marked": len(session.marked),
+            "expected": len(expected) if expected else None,
+            "correct": len(session.marked & expected) if expected else None,
+        },
+        "tracker": {"detections": tracker.detections, "encoded": tracker.encoded, "skipped": tracker.skipped},
+        "motion_gate": motion_gate.stats(),
+        "memory": {"peak_rss_mb": peak_rss_mb(), "gallery_mb": matcher.gallery.nbytes / (1024.0 * 1024.0)},
+        "stages": metrics.summary()["stages"],
+    }
+
+# Lower is better for every compared metric except the throughput ones
+COMPARED = [
+    ("throughput", "display_fps", True),
+    ("throughput", "recognized_per_s", True),
+    ("latency", "p50_ms", False),
+    ("latency", "p95_ms", False),
+    ("latency", "p99_ms", False),
+    ("db", "calls_per_frame", False),
+    ("memory", "peak_rss_mb", False),
+]
+
+def print_report(report, baseline=None):
+    params = report["params"]
+    print(f"Commit {report['commit']}: {params['source']}, gallery {params['gallery_size']}, "
+          f"{params['faces_per_frame']} faces/frame, {params['resolution']} @ {params['fps']} fps, {params['workers']} workers")
+    print(f"{'metric':<28} {'value':>10}" + (f" {'baseline':>10} {'change':>8}" if baseline else ""))
+    for section, key, higher_is_better in COMPARED:
+        value = report[section][key]
+        line = f"{section + '.' + key:<28} {value if value is not None else float('nan'):>10.2f}"
+        if baseline:
+            old = baseline.get(section, {}).get(key)
+            if old and value is not None:
+                change = 100.0 * (value - old) / old
+                worse = change < 0 if higher_is_better else change > 0
+                line += f" {old:>10.2f} {change:>+7.1f}%{' !' if worse and abs(change) >= 5 else ''}"
+        print(line)
+    marking = report["marking"]
+    print(f"Marked {marking['marked']} students" +
+          (f", {marking['correct']} of {marking['expected']} in frame" if marking["expected"] else ""))
+    for stage, s in sorted(report["stages"].items()):
+        print(f"  {stage:<10} n={s['count']:<6} p50={s['p50_ms']:.2f}ms p95={s['p95_ms']:.2f}ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded or synthetic frames through the marking path against an in-memory database.")
+    parser.add_argument("--video", help="Recorded clip to replay; default builds frames from enrollment photos")
+    parser.add_argument("--photos", default=IMAGE_DIR, help="Enrollment photos for synthetic frames")
+    parser.add_argument("--encode-file", default=ENCODE_FILE)
+    parser.add_argument("--gallery", type=int, help="Pad the gallery with random encodings up to this size")
+    parser.add_argument("--faces", type=int, default=4, help="Faces per synthetic frame")
+    parser.add_argument("--resolution", default=RESOLUTION, help="Frame size as WIDTHxHEIGHT")
+    parser.add_argument("--frames", type=int, default=FRAMES)
+    parser.add_argument("--fps", type=float, default=FPS, help="Replay rate; 0 replays as fast as frames are grabbed")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--ann", action="store_true", help="Search the gallery through an IVF index (used from ANN_MIN_GALLERY rows)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--compare", help="Results JSON from an earlier run to compare against")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    report = run_benchmark(args)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,82 @@
+import argparse
+import json
+import logging
+import numpy as np
+from face_matcher import FaceMatcher, MATCH_THRESHOLD
+from face_trainer import photo_encodings, MANIFEST_FILE
+from template_compaction import compact_templates, compact_student, OUTLIER_DISTANCE
+
+QUERY_CHUNK = 512
+
+def tally(counts, own, other, threshold):
+    """A held-out photo is marked correctly, marked as someone else, or rejected."""
+    if own < other and own < threshold:
+        counts["correct"] += 1
+    elif other <= own and other < threshold:
+        counts["wrong"] += 1
+    else:
+        counts["rejected"] += 1
+
+def evaluate(encodings, roll_numbers, templates, outlier_distance=OUTLIER_DISTANCE, threshold=MATCH_THRESHOLD):
+    """Leave-one-photo-out accuracy of the full gallery against the compacted one.
+
+    Each photo of a student with at least two photos is matched against a gallery holding the
+    student's other photos (full) or their compaction (compact) plus everybody else's rows.
+    """
+    rolls = np.array(roll_numbers)
+    full = FaceMatcher(encodings, roll_numbers)
+    compact = FaceMatcher(*compact_templates(encodings, roll_numbers, templates, outlier_distance))
+    compact_rolls = np.array(compact.roll_numbers)
+    rows_by_student = {}
+    for i, roll_no in enumerate(roll_numbers):
+        rows_by_student.setdefault(roll_no, []).append(i)
+    queries = [i for i, roll_no in enumerate(roll_numbers) if len(rows_by_student[roll_no]) > 1]
+
+    counts = {name: {"correct": 0, "wrong": 0, "rejected": 0} for name in ("full", "compact")}
+    for start in range(0, len(queries), QUERY_CHUNK):
+        chunk = queries[start:start + QUERY_CHUNK]
+        full_dists = full.distances(encodings[chunk])
+        compact_dists = compact.distances(encodings[chunk])
+        for j, i in enumerate(chunk):
+            roll_no = roll_numbers[i]
+            own_rows = [r for r in rows_by_student[roll_no] if r != i]
+            others = full_dists[j][rolls != roll_no]
+            tally(counts["full"], full_dists[j][own_rows].min(), others.min() if len(others) else np.inf, threshold)
+            own_templates = compact_student(encodings[own_rows], templates, outlier_distance)
+            others = compact_dists[j][compact_rolls != roll_no]
+            tally(counts["compact"], np.linalg.norm(own_templates - encodings[i], axis=1).min(),
+                  others.min() if len(others) else np.inf, threshold)
+
+    return {
+        "templates": templates,
+        "rows": len(compact),
+        "full_rows": len(full),
+        "reduction": len(full) / len(compact) if len(compact) else 0.0,
+        "queries": len(queries),
+        "full": {k: v / len(queries) for k, v in counts["full"].items()} if queries else {},
+        "compact": {k: v / len(queries) for k, v in counts["compact"].items()} if queries else {},
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure gallery size and leave-one-out accuracy of per-student template compaction.")
+    parser.add_argument("--manifest", default=MANIFEST_FILE)
+    parser.add_argument("--templates", type=int, nargs="+", default=[1, 2, 3])
+    parser.add_argument("--outlier-distance", type=float, default=OUTLIER_DISTANCE)
+    parser.add_argument("--json", help="Write the report to this file")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    _, encodings, roll_numbers = photo_encodings(args.manifest)
+    if not roll_numbers:
+        parser.error(f"No photo encodings in {args.manifest}; run training first")
+    reports = [evaluate(encodings, roll_numbers, k, args.outlier_distance) for k in args.templates]
+    print(f"{len(roll_numbers)} photos of {len(set(roll_numbers))} students, {reports[0]['queries']} held out")
+    print(f"{'templates':>9} {'rows':>7} {'smaller':>8} {'correct':>8} {'full':>7} {'wrong':>7} {'full':>7}")
+    for r in reports:
+        if not r["queries"]:
+            continue
+        print(f"{r['templates']:>9} {r['rows']:>7} {r['reduction']:>7.1f}x {r['compact']['correct']:>8.3f} "
+              f"{r['full']['correct']:>7.3f} {r['compact']['wrong']:>7.3f} {r['full']['wrong']:>7.3f}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(reports, f, indent=2)
@@ -0,0 +1,43 @@
+import json
+import logging
+from collections import namedtuple
+
+logging.basicConfig(level=logging.DEBUG, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Constants
+DETECTOR_PROFILE_FILE = "detector_profile.json"  # Written by tune_detector.py for this machine
+
+# model: "hog" or "cnn"; upsample: face_locations number_of_times_to_upsample;
+# scale: frame downscale before detection; landmarks: "small" (5-point) or "large" (68-point)
+DetectorProfile = namedtuple("DetectorProfile", "name model upsample scale num_jitters landmarks")
+
+DEFAULT_PROFILE = DetectorProfile("hog-q", "hog", 1, 0.25, 1, "small")
+
+PROFILES = [
+    DEFAULT_PROFILE,
+    DetectorProfile("hog-q-up0", "hog", 0, 0.25, 1, "small"),
+    DetectorProfile("hog-q-up2", "hog", 2, 0.25, 1, "small"),
+    DetectorProfile("hog-h-up0", "hog", 0, 0.5, 1, "small"),
+    DetectorProfile("hog-h", "hog", 1, 0.5, 1, "small"),
+    DetectorProfile("hog-h-large", "hog", 1, 0.5, 1, "large"),
+    DetectorProfile("hog-f-up0", "hog", 0, 1.0, 1, "small"),
+    DetectorProfile("cnn-q", "cnn", 1, 0.25, 1, "small"),
+]
+
+def load_profile(path=DETECTOR_PROFILE_FILE):
+    """The profile tuned for this machine, or DEFAULT_PROFILE if none was saved."""
+    try:
+        with open(path) as f:
+            profile = DetectorProfile(**json.load(f))
+        logging.debug(f"Using detector profile {profile}")
+        return profile
+    except FileNotFoundError:
+        return DEFAULT_PROFILE
+    except Exception as e:
+        logging.warning(f"Ignoring invalid detector profile {path}: {str(e)}")
+        return DEFAULT_PROFILE
+
+def save_profile(profile, path=DETECTOR_PROFILE_FILE):
+    with open(path, 'w') as f:
+        json.dump(profile._asdict(), f, indent=4)
+    logging.debug(f"Saved detector profile {profile.name} to {path}")
@@ -0,0 +1,157 @@
+import os
+import re
+import json
+import time
+import threading
+import pickle
+import logging
+from contextlib import contextmanager
+import numpy as np
+from ann_index import gallery_checksum
+
+logging.basicConfig(level=logging.DEBUG, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Constants
+EMBEDDINGS_FILE = "EncodeFile.npy"  # Name of the store; each published gallery is EncodeFile.<generation>.npy
+STORE_VERSION = 2  # 2: the header names a per-generation matrix file (1: the matrix was EncodeFile.npy itself)
+ENCODING_DIM = 128
+KEEP_GENERATIONS = 2  # The previous matrix stays on disk so a reader that just read the old header can still open it
+LOCK_STALE_SECONDS = 120  # A publish lock older than this was left by a crashed process
+
+def meta_path(path):
+    """Header and id index that go with an embeddings matrix: EncodeFile.npy -> EncodeFile.meta.json."""
+    return os.path.splitext(path)[0] + ".meta.json"
+
+def legacy_path(path):
+    """The (encodings, roll_numbers) pickle this store replaces: EncodeFile.npy -> EncodeFile.p."""
+    return os.path.splitext(path)[0] + ".p"
+
+def generation_path(path, generation):
+    """Matrix file of one published gallery: EncodeFile.npy, 7 -> EncodeFile.7.npy."""
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.{generation}{ext}"
+
+def store_stamp(path=EMBEDDINGS_FILE):
+    """Changes whenever a new gallery is published (the header is replaced last), None if there is none."""
+    try:
+        stat = os.stat(meta_path(path))
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns  # Every publish renames a new file over the header
+
+def read_meta(path=EMBEDDINGS_FILE):
+    """The published header: version, generation, data (the matrix file name), dim, count, checksum and ids."""
+    with open(meta_path(path)) as f:
+        meta = json.load(f)
+    if meta.get("version") == 1:
+        meta.update(generation=0, data=os.path.basename(path))  # Written before generations existed
+    elif meta.get("version") != STORE_VERSION:
+        raise ValueError(f"Unsupported embedding store version {meta.get('version')} in {meta_path(path)}")
+    return meta
+
+def _replace_file(path, write):
+    # Readers never see a half-written file: write beside it, then rename over it. The temp name is
+    # per writer, so a sync and a training run in other processes never write into each other's file.
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+@contextmanager
+def _publish_lock(path):
+    # One publisher at a time per store, across processes, so two never claim the same generation
+    lock_path = os.path.splitext(path)[0] + ".lock"
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.stat(lock_path).st_mtime > LOCK_STALE_SECONDS:
+                    os.remove(lock_path)
+                    logging.warning(f"Removed stale publish lock {lock_path}")
+                    continue
+            except FileNotFoundError:
+                continue  # Released between the two calls
+            time.sleep(0.05)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        os.remove(lock_path)
+
+def _remove_old_generations(path, keep):
+    # A file still mapped by a session cannot be removed on Windows; it goes on a later publish
+    stem, ext = os.path.splitext(os.path.basename(path))
+    folder = os.path.dirname(path) or "."
+    pattern = re.compile(rf"{re.escape(stem)}\.(\d+){re.escape(ext)}$")
+    old = [path] if os.path.exists(path) else []  # A version 1 matrix
+    for name in os.listdir(folder):
+        match = pattern.match(name)
+        if match and int(match.group(1)) <= keep:
+            old.append(os.path.join(folder, name))
+    for old_path in old:
+        try:
+            os.remove(old_path)
+        except OSError as e:
+            logging.debug(f"Could not remove old embeddings {old_path} yet: {str(e)}")
+
+def save_embeddings(encodings, roll_numbers, path=EMBEDDINGS_FILE, dim=ENCODING_DIM):
+    """Publish the gallery as a new generation: a float32 .npy matrix, then the JSON header pointing at it.
+
+    Replacing the header is the commit point, so a reader sees either the previous gallery or this
+    one in full. Returns the gallery matrix.
+    """
+    gallery = np.ascontiguousarray(np.asarray(encodings, dtype=np.float32).reshape(len(roll_numbers), dim))
+    checksum = gallery_checksum(gallery)
+    with _publish_lock(path):
+        try:
+            generation = read_meta(path)["generation"] + 1
+        except (FileNotFoundError, ValueError, KeyError):
+            generation = 1
+        data_path = generation_path(path, generation)
+        meta = {
+            "version": STORE_VERSION,
+            "generation": generation,
+            "data": os.path.basename(data_path),
+            "dim": dim,
+            "count": len(roll_numbers),
+            "checksum": checksum,
+            "ids": list(roll_numbers),
+        }
+        _replace_file(data_path, lambda f: np.save(f, gallery, allow_pickle=False))
+        _replace_file(meta_path(path), lambda f: f.write(json.dumps(meta).encode()))
+        _remove_old_generations(path, keep=generation - KEEP_GENERATIONS)
+    logging.debug(f"Published {len(roll_numbers)} embeddings as generation {generation} in {data_path}")
+    return gallery
+
+def migrate_pickle(path=EMBEDDINGS_FILE):
+    """Convert the legacy pickle next to path into the store; returns False if there is none."""
+    old_path = legacy_path(path)
+    if not os.path.exists(old_path):
+        return False
+    with open(old_path, 'rb') as file:
+        encode_list, roll_numbers = pickle.load(file)
+    dim = len(encode_list[0]) if len(encode_list) else ENCODING_DIM
+    save_embeddings(encode_list, roll_numbers, path, dim=dim)
+    logging.info(f"Migrated {len(roll_numbers)} encodings from {old_path} to {path}")
+    return True
+
+def load_embeddings(path=EMBEDDINGS_FILE, mmap=True, verify=True):
+    """Return (gallery, roll_numbers) of the published generation, gallery a read-only memory map.
+
+    The map is shared with other processes and released when the last array using it is dropped.
+    A legacy EncodeFile.p is migrated the first time the store is missing. Raises FileNotFoundError
+    if neither exists and ValueError if the matrix does not match its header.
+    """
+    if not os.path.exists(meta_path(path)) and not migrate_pickle(path):
+        raise FileNotFoundError(f"No face encodings at {path}")
+    meta = read_meta(path)
+    data_path = os.path.join(os.path.dirname(path), meta["data"])
+    gallery = np.load(data_path, mmap_mode='r' if mmap else None, allow_pickle=False)
+    if gallery.dtype != np.float32 or gallery.shape != (meta["count"], meta["dim"]) or len(meta["ids"]) != meta["count"]:
+        raise ValueError(f"{data_path} holds {gallery.dtype} {gallery.shape}, header expects {meta['count']} x {meta['dim']} float32")
+    if verify and gallery_checksum(gallery) != meta["checksum"]:
+        raise ValueError(f"{data_path} does not match the checksum in {meta_path(path)}")
+    logging.debug(f"Loaded {meta['count']} embeddings (generation {meta['generation']}) from {data_path}")
+    return gallery, meta["ids"]
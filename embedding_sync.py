@@ -0,0 +1,178 @@
+import os
+import json
+import zlib
+import argparse
+import threading
+import logging
+from datetime import datetime, timedelta
+import numpy as np
+from db_connection import DatabaseConnection
+from embedding_store import load_embeddings, save_embeddings, store_stamp, EMBEDDINGS_FILE, ENCODING_DIM
+from face_trainer import save_gallery
+from ann_index import ANN_INDEX_FILE
+
+logging.basicConfig(level=logging.DEBUG, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Constants
+SYNC_OVERLAP_SECONDS = 60  # Re-read rows updated this long before the last sync, in case a write committed late
+PUSH_BATCH = 200  # Students per INSERT, well under max_allowed_packet even with many photos each
+UPSERT_QUERY = """
+    INSERT INTO face_embedding (Roll_no, Dim, Encodings, Checksum)
+    VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE Dim = VALUES(Dim), Encodings = VALUES(Encodings), Checksum = VALUES(Checksum),
+        Updated_At = CURRENT_TIMESTAMP(6)
+"""
+
+def sync_path(path=EMBEDDINGS_FILE):
+    """When the local store was last brought up to date: EncodeFile.npy -> EncodeFile.sync.json."""
+    return os.path.splitext(path)[0] + ".sync.json"
+
+def pack(encodings):
+    """One student's (count x dim) encodings as a little-endian float32 blob and its CRC32."""
+    blob = np.ascontiguousarray(encodings, dtype="<f4").tobytes()
+    return blob, zlib.crc32(blob)
+
+def unpack(blob, dim):
+    return np.frombuffer(blob, dtype="<f4").reshape(-1, dim).astype(np.float32)
+
+def group_by_student(encodings, roll_numbers):
+    """{roll_no: (count x dim) encodings} from gallery rows, keeping each student's row order."""
+    rows = {}
+    for i, roll_no in enumerate(roll_numbers):
+        rows.setdefault(roll_no, []).append(i)
+    gallery = np.asarray(encodings, dtype=np.float32)
+    return {roll_no: gallery[indices] for roll_no, indices in rows.items()}
+
+def push_embeddings(encodings, roll_numbers):
+    """Upload a trained gallery to face_embedding, one row per student.
+
+    Only students whose encodings changed are written, and students no longer in the gallery lose
+    their row. Roll numbers missing from the student table are skipped. Returns (written, removed, skipped).
+    """
+    students = group_by_student(encodings, roll_numbers)
+    with DatabaseConnection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT s.Roll_no, e.Checksum
+            FROM student s
+            LEFT JOIN face_embedding e ON e.Roll_no = s.Roll_no
+        """)
+        stored = dict(cursor.fetchall())
+        rows = []
+        for roll_no, student_encodings in students.items():
+            if roll_no not in stored:
+                continue
+            blob, checksum = pack(student_encodings)
+            if stored[roll_no] != checksum:
+                rows.append((roll_no, student_encodings.shape[1], blob, checksum))
+        removed = [(roll_no,) for roll_no, checksum in stored.items() if checksum is not None and roll_no not in students]
+        for start in range(0, len(rows), PUSH_BATCH):
+            cursor.executemany(UPSERT_QUERY, rows[start:start + PUSH_BATCH])
+        if removed:
+            cursor.executemany("DELETE FROM face_embedding WHERE Roll_no = %s", removed)
+        conn.commit()
+    skipped = [roll_no for roll_no in students if roll_no not in stored]
+    if skipped:
+        logging.warning(f"{len(skipped)} trained students are not in the student table: {', '.join(skipped[:10])}")
+    logging.info(f"Pushed embeddings: {len(rows)} students written, {len(removed)} removed")
+    return len(rows), len(removed), len(skipped)
+
+def load_sync_state(path=EMBEDDINGS_FILE):
+    """(since, rows, seen) of the last sync: the newest Updated_At, the table's row count and the
+    {roll_no: checksum} of the rows it read; (None, None, {}) before the first sync."""
+    try:
+        with open(sync_path(path)) as f:
+            state = json.load(f)
+        since = datetime.fromisoformat(state["since"]) if state["since"] else None
+        return since, int(state["rows"]), dict(state["seen"])
+    except (FileNotFoundError, ValueError, KeyError, TypeError):
+        return None, None, {}
+
+def save_sync_state(since, rows, seen, path=EMBEDDINGS_FILE):
+    tmp_path = f"{sync_path(path)}.{os.getpid()}.{threading.get_ident()}.tmp"  # Sessions may sync concurrently
+    with open(tmp_path, 'w') as f:
+        json.dump({"since": since.isoformat() if since else None, "rows": rows, "seen": seen}, f)
+    os.replace(tmp_path, sync_path(path))
+
+def load_local(path=EMBEDDINGS_FILE):
+    """The local store grouped by student; empty if there is none yet (a legacy pickle is migrated)."""
+    try:
+        gallery, roll_numbers = load_embeddings(path)
+    except FileNotFoundError:
+        return {}
+    return group_by_student(gallery, roll_numbers)  # Copies, so the memory map is released here
+
+def sync_embeddings(path=EMBEDDINGS_FILE, index_file=ANN_INDEX_FILE):
+    """Bring the local store up to date with face_embedding, reading only rows changed since the last sync.
+
+    The database is asked first; the local store is only opened when rows changed or the table's
+    row count moved, so the periodic sync of a running session costs two small queries.
+    Students deleted from the database (their row goes with ON DELETE CASCADE) are dropped too,
+    but only once a previous sync saw rows and the table is not empty: on the first sync, or before
+    training has pushed anything, the local gallery is kept and only added to. Push from the
+    training PC before classroom PCs pull. A new local generation, which running sessions swap in,
+    is published only when something changed. Returns the number of students added, updated or removed.
+    """
+    since, last_rows, seen = load_sync_state(path)
+    if store_stamp(path) is None:
+        since, last_rows = None, None  # First sync, or the local store was removed: read every row
+    synced_before = last_rows is not None
+    pushed_before = bool(last_rows)  # A sync that saw an empty table is no baseline for deletions
+
+    with DatabaseConnection() as conn:
+        cursor = conn.cursor()  # One transaction, so the queries below see the same snapshot
+        query = "SELECT Roll_no, Dim, Encodings, Checksum, Updated_At FROM face_embedding"
+        if since is None:
+            cursor.execute(query)
+        else:
+            cursor.execute(query + " WHERE Updated_At >= %s", (since - timedelta(seconds=SYNC_OVERLAP_SECONDS),))
+        fetched = cursor.fetchall()
+        cursor.execute("SELECT COUNT(*) FROM face_embedding")
+        (count,) = cursor.fetchone()
+        fetched_checksums = {row[0]: row[3] for row in fetched}
+        if synced_before and count == last_rows and all(seen.get(r) == c for r, c in fetched_checksums.items()):
+            return 0  # Nothing written or deleted since the last sync; the overlap only re-read known rows
+
+        local = load_local(path)
+        changed = 0
+        for roll_no, dim, blob, checksum, updated_at in fetched:
+            since = updated_at if since is None or updated_at > since else since
+            if roll_no in local and pack(local[roll_no])[1] == checksum:
+                continue  # Re-read in the overlap, or the gallery this PC trained itself
+            local[roll_no] = unpack(blob, dim)
+            changed += 1
+
+        # Every database row is now local, so extra local students were deleted from the database.
+        # An empty table or a first sync says nothing about deletions (nobody has pushed yet).
+        if pushed_before and count and len(local) > count:
+            cursor.execute("SELECT Roll_no FROM face_embedding")
+            present = {roll_no for (roll_no,) in cursor.fetchall()}
+            for roll_no in [r for r in local if r not in present]:
+                del local[roll_no]
+                changed += 1
+
+    if changed:
+        roll_numbers = [roll_no for roll_no in sorted(local) for _ in range(len(local[roll_no]))]
+        if local:
+            save_gallery(np.concatenate([local[roll_no] for roll_no in sorted(local)]), roll_numbers, path, index_file)
+        else:
+            save_embeddings(np.empty((0, ENCODING_DIM), dtype=np.float32), [], path)
+        logging.info(f"Synced {changed} changed students; local gallery has {len(roll_numbers)} encodings")
+    save_sync_state(since, count, fetched_checksums, path)
+    return changed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Share face embeddings through the database.")
+    parser.add_argument("action", choices=["push", "pull"], help="push the local gallery, or pull changes into it")
+    parser.add_argument("--encode-file", default=EMBEDDINGS_FILE)
+    parser.add_argument("--full", action="store_true", help="pull every row, not only those changed since the last sync")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    if args.action == "push":
+        written, removed, skipped = push_embeddings(*load_embeddings(args.encode_file))
+        print(f"{written} students written, {removed} removed, {skipped} not in the student table")
+    else:
+        if args.full and os.path.exists(sync_path(args.encode_file)):
+            os.remove(sync_path(args.encode_file))
+        print(f"{sync_embeddings(args.encode_file)} students changed")
@@ -0,0 +1,73 @@
+import numpy as np
+import logging
+from ann_index import IVFIndex, ANN_MIN_GALLERY
+from embedding_store import load_embeddings, EMBEDDINGS_FILE
+
+logging.basicConfig(level=logging.DEBUG, format="%(asctime)s - %(levelname)s - %(message)s")
+
+ENCODING_DIM = 128  # Length of a dlib face encoding
+MATCH_THRESHOLD = 0.4  # Maximum distance at which a face counts as a known student
+
+class FaceMatcher:
+    def __init__(self, encodings, roll_numbers, dim=ENCODING_DIM, index=None):
+        """Hold the known encodings as one contiguous float32 matrix with precomputed squared norms."""
+        self.gallery = np.ascontiguousarray(np.asarray(encodings, dtype=np.float32).reshape(len(roll_numbers), dim))
+        self.roll_numbers = list(roll_numbers)
+        self.sq_norms = np.einsum("ij,ij->i", self.gallery, self.gallery)
+        self.index = None
+        if index is not None:
+            self.attach_index(index)
+        logging.debug(f"FaceMatcher built with {len(self.roll_numbers)} encodings")
+
+    @classmethod
+    def from_file(cls, encode_file=EMBEDDINGS_FILE):
+        """Open the embedding store written by train.py; the matrix stays memory-mapped, not copied."""
+        gallery, roll_numbers = load_embeddings(encode_file)
+        return cls(gallery, roll_numbers, dim=gallery.shape[1])
+
+    def __len__(self):
+        return len(self.roll_numbers)
+
+    def attach_index(self, index):
+        """Use an approximate index for large galleries; a stale index is ignored and exact search is kept."""
+        if not index.matches(self.gallery):
+            logging.warning("ANN index does not match the loaded encodings, using exact search")
+            return False
+        self.index = index
+        return True
+
+    def load_index(self, path):
+        """Load and attach an index file if it exists; any failure falls back to exact search."""
+        try:
+            return self.attach_index(IVFIndex.load(path))
+        except FileNotFoundError:
+            logging.debug(f"No ANN index at {path}, using exact search")
+        except Exception as e:
+            logging.warning(f"Failed to load ANN index {path}: {str(e)}")
+        return False
+
+    def subset(self, roll_numbers):
+        """Return a matcher over only the encodings of the given students (e.g. one section's roster)."""
+        wanted = set(roll_numbers)
+        rows = [i for i, roll_no in enumerate(self.roll_numbers) if roll_no in wanted]
+        logging.debug(f"Sliced {len(rows)} of {len(self)} encodings for {len(wanted)} students")
+        return FaceMatcher(self.gallery[rows], [self.roll_numbers[i] for i in rows], dim=self.gallery.shape[1])
+
+    def distances(self, face_encodings):
+        """Return the (faces x gallery) matrix of Euclidean distances, same metric as face_recognition.face_distance."""
+        queries = np.asarray(face_encodings, dtype=np.float32).reshape(-1, self.gallery.shape[1])
+        q_norms = np.einsum("ij,ij->i", queries, queries)
+        sq = q_norms[:, None] + self.sq_norms[None, :] - 2.0 * (queries @ self.gallery.T)
+        np.maximum(sq, 0.0, out=sq)
+        return np.sqrt(sq)
+
+    def match(self, face_encodings, exact=False):
+        """Score all faces of a frame in one batch and return (best_indices, best_distances)."""
+        if len(face_encodings) == 0 or len(self) == 0:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+        if not exact and self.index is not None and len(self) >= ANN_MIN_GALLERY:
+            queries = np.asarray(face_encodings, dtype=np.float32).reshape(-1, self.gallery.shape[1])
+            return self.index.search(self.gallery, self.sq_norms, queries)
+        dists = self.distances(face_encodings)
+        best = np.argmin(dists, axis=1)
+        return best, dists[np.arange(len(best)), best]
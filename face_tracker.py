@@ -0,0 +1,175 @@
+import time
+import itertools
+import threading
+import logging
+from collections import Counter, deque
+
+logging.basicConfig(level=logging.DEBUG, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Constants
+DETECT_EVERY = 10  # Frames between full detections while every track is confirmed
+IOU_THRESHOLD = 0.3  # Minimum overlap for a detection to continue a track
+CENTROID_FACTOR = 0.5  # ...or centroid within this fraction of the track's width
+MAX_MISSES = 2  # Detections a track may be missing from before it is dropped
+VOTES_NEEDED = 3  # Agreeing matches before a track is committed to a student
+VOTE_WINDOW = 8  # ...among the track's last this many votes (one per detection result), however far apart
+UNKNOWN_VOTES = 4  # Non-matching encodings in the window before a track is settled as unknown
+UNKNOWN_RETRY_SECONDS = 5  # An unknown track is voted on again after this long (bad first looks: head down, blur)
+
+def iou(a, b):
+    """Intersection over union of two (top, right, bottom, left) boxes."""
+    top, right = max(a[0], b[0]), min(a[1], b[1])
+    bottom, left = min(a[2], b[2]), max(a[3], b[3])
+    inter = max(0, right - left) * max(0, bottom - top)
+    if inter == 0:
+        return 0.0
+    area_a = (a[1] - a[3]) * (a[2] - a[0])
+    area_b = (b[1] - b[3]) * (b[2] - b[0])
+    return inter / float(area_a + area_b - inter)
+
+def centroid_close(a, b, factor=CENTROID_FACTOR):
+    ax, ay = (a[1] + a[3]) / 2.0, (a[0] + a[2]) / 2.0
+    bx, by = (b[1] + b[3]) / 2.0, (b[0] + b[2]) / 2.0
+    return ((ax - bx) ** 2 + (ay - by) ** 2) ** 0.5 <= factor * (a[1] - a[3])
+
+class VoteBuffer:
+    """Recent match candidates of one track, used to commit an identity only once it is stable.
+
+    The window counts the track's own votes rather than camera frames, so a seated student who is
+    only re-detected every few seconds (motion gate, slow workers) still collects enough votes.
+    """
+
+    def __init__(self, needed=VOTES_NEEDED, window=VOTE_WINDOW, unknown_votes=UNKNOWN_VOTES):
+        self.needed = needed
+        self.window = window
+        self.unknown_votes = unknown_votes
+        self.votes = deque(maxlen=window)  # (frame_id, roll_no or None, distance)
+
+    def add(self, frame_id, roll_no, distance):
+        self.votes.append((frame_id, roll_no, float(distance)))  # The oldest vote falls out of the window
+
+    def decide(self, threshold):
+        """Return ("student", roll_no) once VOTES_NEEDED votes agree with mean distance under threshold,
+        ("unknown", None) once too many votes matched nobody, else ("pending", None)."""
+        counts = Counter(roll_no for _, roll_no, _ in self.votes if roll_no is not None)
+        for roll_no, count in counts.most_common():
+            if count < self.needed:
+                break
+            mean = sum(d for _, r, d in self.votes if r == roll_no) / count
+            if mean < threshold:
+                return "student", roll_no
+        if len(self.votes) - sum(counts.values()) >= self.unknown_votes:
+            return "unknown", None
+        return "pending", None
+
+class Track:
+    _ids = itertools.count(1)
+
+    def __init__(self, box):
+        self.track_id = next(Track._ids)
+        self.box = box
+        self.misses = 0
+        self.confirmed = False  # True once the identity is settled (a student, or rejected as unknown)
+        self.roll_no = None
+        self.label = "Unknown"
+        self.color = (0, 0, 255)
+        self.encoding = None  # Fresh encoding waiting to be matched
+        self.votes = VoteBuffer()
+        self.retry_at = None  # When a settled-unknown track is reopened for voting
+
+    def confirm(self, roll_no, label, color, retry_after=None):
+        """Settle the identity; with retry_after (seconds) the track is voted on again later."""
+        self.confirmed = True
+        self.roll_no = roll_no
+        self.label = label
+        self.color = color
+        self.retry_at = None if retry_after is None else time.monotonic() + retry_after
+
+    def reopen(self):
+        # Encoded and voted on again from scratch; the label stays until the next decision
+        self.confirmed = False
+        self.votes = VoteBuffer()
+        self.retry_at = None
+
+class FaceTracker:
+    """Keeps identities on face boxes between detections so known faces are not re-encoded.
+
+    The dispatcher thread calls plan() and the consumer thread calls update(); a lock keeps them apart.
+    """
+
+    def __init__(self, detect_every=DETECT_EVERY):
+        self.detect_every = detect_every
+        self.tracks = []
+        self.detections = 0
+        self.encoded = 0  # Faces the workers encoded
+        self.skipped = 0  # Faces on confirmed tracks that were not re-encoded
+        self._last_detection = -detect_every
+        self._lock = threading.Lock()
+
+    def plan(self, frame_id):
+        """Return the confirmed boxes to skip encoding for if frame_id should be detected, else None."""
+        with self._lock:
+            unsettled = any(not t.confirmed or t.misses for t in self.tracks)
+            if not unsettled and frame_id - self._last_detection < self.detect_every:
+                return None
+            self._last_detection = frame_id
+            return [t.box for t in self.tracks if t.confirmed]
+
+    def voting(self):
+        """True while some track still needs encodings to settle its identity."""
+        with self._lock:
+            return any(not t.confirmed for t in self.tracks)
+
+    def update(self, locations, encodings):
+        """Associate one detection result with the tracks and return tracks holding a new encoding.
+
+        encodings[i] is None for detections the worker skipped because they overlapped a confirmed track.
+        """
+        with self._lock:
+            self.detections += 1
+            now = time.monotonic()
+            for track in self.tracks:
+                if track.retry_at is not None and now >= track.retry_at:
+                    track.reopen()  # Encoded again from the next planned detection
+            existing = self.tracks
+            pairs = sorted(
+                ((iou(t.box, box), ti, di) for ti, t in enumerate(existing) for di, box in enumerate(locations)),
+                reverse=True,
+            )
+            used_tracks, used_detections = set(), set()
+            for overlap, ti, di in pairs:
+                if ti in used_tracks or di in used_detections:
+                    continue
+                if overlap < IOU_THRESHOLD and not centroid_close(existing[ti].box, locations[di]):
+                    continue
+                used_tracks.add(ti)
+                used_detections.add(di)
+                track = existing[ti]
+                track.box = locations[di]
+                track.misses = 0
+                if encodings[di] is not None and not track.confirmed:
+                    track.encoding = encodings[di]
+
+            kept = []
+            for ti, track in enumerate(existing):
+                if ti not in used_tracks:
+                    track.misses += 1
+                if track.misses <= MAX_MISSES:
+                    kept.append(track)
+            if len(kept) < len(existing):
+                logging.debug(f"Dropped {len(existing) - len(kept)} lost tracks")
+
+            for di, box in enumerate(locations):
+                if di not in used_detections:
+                    track = Track(box)
+                    track.encoding = encodings[di]
+                    kept.append(track)
+            self.tracks = kept
+
+            self.encoded += sum(1 for e in encodings if e is not None)
+            self.skipped += sum(1 for e in encodings if e is None)
+            return [t for t in self.tracks if t.encoding is not None]
+
+    def visible_tracks(self):
+        with self._lock:
+            return [t for t in self.tracks if t.misses == 0]
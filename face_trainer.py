@@ -0,0 +1,250 @@
+import os
+import json
+import pickle
+import hashlib
+import logging
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import cv2
+import numpy as np
+import face_recognition
+from ann_index import IVFIndex, ANN_INDEX_FILE, ANN_MIN_GALLERY
+from embedding_store import save_embeddings, store_stamp, EMBEDDINGS_FILE, ENCODING_DIM
+from template_compaction import compact_templates
+
+logging.basicConfig(level=logging.DEBUG, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Constants
+IMAGE_DIR = "photos"
+ENCODE_FILE = EMBEDDINGS_FILE
+MANIFEST_FILE = "EncodeFile.manifest.p"  # Per-image size, mtime, hash and encoding from the last training run
+MANIFEST_VERSION = 1
+HASH_CHUNK = 1 << 20
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+FACE_BOXES_FILE = "faces.json"  # Per student folder: {filename: [top, right, bottom, left]} recorded at capture
+TRAIN_WORKERS = os.cpu_count() or 1
+MAX_CHUNK = 32  # Images per worker task; a student's folder is split into chunks no larger than this
+MIN_PARALLEL = 8  # Fewer images than this are encoded in-process rather than paying for worker start-up
+TEMPLATES_PER_STUDENT = None  # 1 keeps each student's centroid, k > 1 keeps k medoid photos; None keeps every photo
+
+# encodings/roll_numbers: the full gallery as written to ENCODE_FILE (after compaction); faces: images with
+# a usable face; encoded: images run through the model this time; reused: images taken from the manifest;
+# removed: manifest images no longer on disk; problems: (path, message) for images that could not be read
+# or have no face
+TrainingResult = namedtuple("TrainingResult", "encodings roll_numbers faces encoded reused removed problems")
+
+def image_files(image_dir=IMAGE_DIR):
+    """(key, roll_no, path) for every enrollment image, in a stable order; key is "<roll_no>/<filename>"."""
+    files = []
+    for roll_no in sorted(os.listdir(image_dir)):
+        folder_path = os.path.join(image_dir, roll_no)
+        if not os.path.isdir(folder_path):
+            continue
+        for filename in sorted(os.listdir(folder_path)):
+            path = os.path.join(folder_path, filename)
+            if os.path.splitext(filename)[1].lower() in IMAGE_EXTENSIONS and os.path.isfile(path):
+                files.append((f"{roll_no}/{filename}", roll_no, path))
+    return files
+
+def load_face_boxes(folder_path):
+    """{filename: (top, right, bottom, left)} recorded when the photos in folder_path were taken."""
+    try:
+        with open(os.path.join(folder_path, FACE_BOXES_FILE)) as f:
+            return {filename: tuple(box) for filename, box in json.load(f).items()}
+    except FileNotFoundError:
+        return {}
+    except (ValueError, OSError) as e:
+        logging.warning(f"Ignoring face boxes in {folder_path}: {str(e)}")
+        return {}
+
+def record_face_box(folder_path, filename, box):
+    """Remember where the face is in a freshly saved photo; box=None forgets a previous one."""
+    boxes = load_face_boxes(folder_path)
+    if box is None:
+        if boxes.pop(filename, None) is None:
+            return
+    else:
+        boxes[filename] = tuple(int(v) for v in box)
+    path = os.path.join(folder_path, FACE_BOXES_FILE)
+    with open(f"{path}.tmp", 'w') as f:
+        json.dump(boxes, f, indent=4)
+    os.replace(f"{path}.tmp", path)
+
+def file_digest(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def encode_image(path, box=None):
+    """(encoding, None) for the first face in the image, or (None, problem) if there is none.
+
+    With the face box recorded at capture the detection pass is skipped.
+    """
+    img = cv2.imread(path)
+    if img is None:
+        return None, "Could not load image"
+    img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    if box is not None:
+        faces = face_recognition.face_encodings(img_rgb, known_face_locations=[box])
+    else:
+        faces = face_recognition.face_encodings(img_rgb)
+    if not faces:
+        return None, "No face found"
+    return np.asarray(faces[0], dtype=np.float32), None
+
+def encode_images(paths):
+    """Worker task: encode_image for each path, in order, using any face boxes recorded at capture."""
+    boxes = {}
+    results = []
+    for path in paths:
+        folder_path, filename = os.path.split(path)
+        if folder_path not in boxes:
+            boxes[folder_path] = load_face_boxes(folder_path)
+        results.append(encode_image(path, boxes[folder_path].get(filename)))
+    return results
+
+def chunk_by_student(to_encode, max_chunk=MAX_CHUNK):
+    """Group planned images into tasks of one student's images each, at most max_chunk long."""
+    chunks = []
+    for item in to_encode:
+        roll_no = item[1]
+        if chunks and chunks[-1][0][1] == roll_no and len(chunks[-1]) < max_chunk:
+            chunks[-1].append(item)
+        else:
+            chunks.append([item])
+    return chunks
+
+def encode_planned(to_encode, workers=TRAIN_WORKERS, on_progress=None):
+    """Yield (item, (encoding, problem)) for every planned image, fanned out over worker processes.
+
+    Results arrive in completion order; callers key them by image so the gallery order does not depend on it.
+    """
+    total = len(to_encode)
+    if workers <= 1 or total < MIN_PARALLEL:
+        for done, item in enumerate(to_encode, 1):
+            yield item, encode_images([item[2]])[0]
+            if on_progress:
+                on_progress(done, total)
+        return
+    chunks = chunk_by_student(to_encode)
+    logging.debug(f"Encoding {total} images in {len(chunks)} chunks on {workers} workers")
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(encode_images, [item[2] for item in chunk]): chunk for chunk in chunks}
+        for future in as_completed(futures):
+            chunk = futures[future]
+            yield from zip(chunk, future.result())
+            done += len(chunk)
+            if on_progress:
+                on_progress(done, total)
+
+def load_manifest(path=MANIFEST_FILE):
+    """({key: entry}, templates_per_student) from the last run, or ({}, None) if there is none or it is unreadable."""
+    try:
+        with open(path, 'rb') as f:
+            manifest = pickle.load(f)
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest["entries"], manifest.get("templates")
+        logging.warning(f"Ignoring training manifest {path} with version {manifest.get('version')}")
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logging.warning(f"Ignoring unreadable training manifest {path}: {str(e)}")
+    return {}, None
+
+def photo_encodings(manifest_file=MANIFEST_FILE):
+    """(keys, encodings, roll_numbers) of every enrollment photo with a face in the manifest, before compaction."""
+    entries, _ = load_manifest(manifest_file)
+    rows = [(key, entry) for key, entry in sorted(entries.items()) if entry["encoding"] is not None]
+    encodings = np.array([entry["encoding"] for _, entry in rows], dtype=np.float32).reshape(len(rows), ENCODING_DIM)
+    return [key for key, _ in rows], encodings, [entry["roll_no"] for _, entry in rows]
+
+def save_manifest(entries, path=MANIFEST_FILE, templates=None):
+    # Written beside and renamed over, so a UI run and the training daemon never leave it torn
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump({"version": MANIFEST_VERSION, "entries": entries, "templates": templates}, f)
+    os.replace(tmp_path, path)
+
+def save_gallery(encodings, roll_numbers, encode_file=ENCODE_FILE, index_file=ANN_INDEX_FILE):
+    """Rebuild (or remove) the IVF index, then publish the embedding store it goes with.
+
+    The index is written first so a running session that swaps in the new gallery finds its index
+    ready; sessions still on the old gallery ignore the mismatched index and search exactly.
+    """
+    if len(roll_numbers):
+        gallery = np.asarray(encodings, dtype=np.float32).reshape(len(roll_numbers), -1)
+    else:
+        gallery = np.empty((0, ENCODING_DIM), dtype=np.float32)  # Everyone was removed
+    if len(gallery) >= ANN_MIN_GALLERY:
+        IVFIndex.build(gallery).save(index_file)
+    elif os.path.exists(index_file):
+        os.remove(index_file)  # Small gallery, exact search only
+    save_embeddings(gallery, roll_numbers, encode_file, dim=gallery.shape[1])
+
+def plan_training(files, entries):
+    """Split files into (kept entries, files to encode).
+
+    An image is reused when its size and mtime match the manifest, or when its content hash
+    matches an entry of the same student (a touched or renamed file). Everything else is encoded.
+    """
+    by_hash = {(entry["roll_no"], entry["sha1"]): entry for entry in entries.values()}
+    kept = {}
+    to_encode = []
+    for key, roll_no, path in files:
+        stat = os.stat(path)
+        entry = entries.get(key)
+        if entry is not None and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns:
+            kept[key] = entry
+            continue
+        sha1 = file_digest(path)
+        same = by_hash.get((roll_no, sha1))
+        if same is not None:
+            kept[key] = dict(same, size=stat.st_size, mtime=stat.st_mtime_ns)
+            continue
+        to_encode.append((key, roll_no, path, stat.st_size, stat.st_mtime_ns, sha1))
+    return kept, to_encode
+
+def train(image_dir=IMAGE_DIR, encode_file=ENCODE_FILE, manifest_file=MANIFEST_FILE, on_progress=None,
+          workers=TRAIN_WORKERS, templates_per_student=TEMPLATES_PER_STUDENT):
+    """Bring encode_file up to date with image_dir, encoding only new or changed images.
+
+    Images are encoded on up to workers processes, one student's folder per task; on_progress(done,
+    total) is called from the calling thread as tasks finish. Images of deleted files and students
+    drop out of the gallery, which keeps the image_files() order whatever order tasks finish in.
+    With templates_per_student, each student's encodings are compacted before they are written
+    (see template_compaction); the manifest keeps every photo's encoding, so the setting can be
+    changed without re-encoding. Returns a TrainingResult; the gallery is only written if something
+    changed.
+    """
+    entries, last_templates = load_manifest(manifest_file)
+    files = image_files(image_dir)
+    kept, to_encode = plan_training(files, entries)
+    removed = len(set(entries) - {key for key, _, _ in files})
+    logging.debug(f"Training plan: {len(kept)} images unchanged, {len(to_encode)} to encode, {removed} removed")
+
+    for (key, roll_no, path, size, mtime, sha1), (encoding, problem) in encode_planned(to_encode, workers, on_progress):
+        # Images without a face are remembered too, so they are not retried until they change
+        kept[key] = {"roll_no": roll_no, "size": size, "mtime": mtime, "sha1": sha1, "encoding": encoding, "problem": problem}
+
+    encodings = []
+    roll_numbers = []
+    problems = []
+    for key, roll_no, path in files:
+        entry = kept[key]
+        if entry["encoding"] is not None:
+            encodings.append(entry["encoding"])
+            roll_numbers.append(roll_no)
+        else:
+            problems.append((path, entry["problem"]))
+    faces = len(encodings)
+    if templates_per_student and encodings:
+        encodings, roll_numbers = compact_templates(encodings, roll_numbers, templates_per_student)
+
+    if to_encode or removed or templates_per_student != last_templates or store_stamp(encode_file) is None:
+        # Published even when empty, so students whose photos were all deleted stop matching
+        save_gallery(encodings, roll_numbers, encode_file)
+        save_manifest(kept, manifest_file, templates_per_student)
+    return TrainingResult(encodings, roll_numbers, faces, len(to_encode), len(files) - len(to_encode), removed, problems)
@@ -0,0 +1,76 @@
+import threading
+import logging
+from embedding_store import store_stamp, EMBEDDINGS_FILE
+
+logging.basicConfig(level=logging.DEBUG, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Constants
+CHECK_SECONDS = 10  # How often a running session looks for a newly published gallery
+STOP_TIMEOUT = 2  # How long stop() waits for a sync or load in progress
+
+class GalleryReloader:
+    """Loads a newly published gallery in the background so a camera session can swap it in between frames.
+
+    load() builds whatever the session matches against (e.g. the full matcher and its section
+    subset) on this thread; the camera loop only picks up the result with take(). stamp is the
+    store_stamp() of the gallery the session started with. sync(), if given, runs before every
+    check to pull a gallery published elsewhere into the local store.
+    """
+
+    def __init__(self, load, stamp, encode_file=EMBEDDINGS_FILE, interval=CHECK_SECONDS, sync=None):
+        self.load = load
+        self.sync = sync
+        self.stamp = stamp
+        self.encode_file = encode_file
+        self.interval = interval
+        self.reloads = 0
+        self._ready = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._sync_failed = False
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if self.sync is not None:
+                try:
+                    self.sync()
+                    self._sync_failed = False
+                except Exception as e:
+                    if not self._sync_failed:  # Logged once per outage; the local gallery keeps working
+                        logging.warning(f"Failed to sync face encodings, using the local copy: {str(e)}")
+                    self._sync_failed = True
+            stamp = store_stamp(self.encode_file)
+            if stamp is None or stamp == self.stamp:
+                continue
+            try:
+                loaded = self.load()
+            except Exception as e:
+                logging.error(f"Failed to load the new face encodings, keeping the current ones: {str(e)}")
+                self.stamp = stamp  # Not retried until the next publish
+                continue
+            with self._lock:
+                self.stamp = stamp
+                self._ready = (stamp, loaded)  # Replaces a gallery that was never taken
+                self.reloads += 1
+            logging.info(f"New face encodings ready to swap in (reload {self.reloads})")
+
+    def take(self):
+        """Return (stamp, loaded) once for a gallery published since the last call, otherwise None."""
+        with self._lock:
+            ready, self._ready = self._ready, None
+        return ready
+
+    def stop(self, timeout=STOP_TIMEOUT):
+        """Stop checking; a thread still busy in sync() or load() after timeout is left to exit on its own."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                logging.warning(f"Gallery reload still running after {timeout}s, leaving it behind")
+        self._ready = None  # Drop a gallery loaded after the session's last take()
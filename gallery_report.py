@@ -0,0 +1,141 @@
+import argparse
+import csv
+import json
+import time
+import logging
+import numpy as np
+from face_matcher import MATCH_THRESHOLD
+from face_trainer import photo_encodings, MANIFEST_FILE
+from template_compaction import OUTLIER_DISTANCE
+
+logging.basicConfig(level=logging.DEBUG, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Constants
+GALLERY_REPORT = "gallery_report"  # Written as gallery_report.json and gallery_report.csv
+BLOCK = 2048  # Rows per side of each distance block: 2048 x 2048 float32 = 16 MB
+
+def analyze(encodings, roll_numbers, photos=None, threshold=MATCH_THRESHOLD, outlier_distance=OUTLIER_DISTANCE, block=BLOCK):
+    """Find confusable students and suspicious enrollment photos in one blocked pass over all pairs.
+
+    pairs: one entry per pair of different students with photos closer than threshold (the
+    closest such photos and how many photo pairs are that close). outliers: photos farther than
+    outlier_distance from their student's centroid, or closer to another student than threshold
+    and than their own centroid (likely someone else's face in the folder).
+    """
+    x = np.ascontiguousarray(np.asarray(encodings, dtype=np.float32))
+    n = len(x)
+    photos = photos or [str(i) for i in range(n)]
+    students, ids = np.unique(np.asarray(roll_numbers), return_inverse=True)
+    sq = np.einsum("ij,ij->i", x, x)
+    nearest_other = np.full(n, np.inf, dtype=np.float32)  # Squared distance to the closest other student's photo
+    nearest_other_row = np.full(n, -1, dtype=np.intp)
+    threshold_sq = threshold * threshold
+    pairs = {}
+
+    for s in range(0, n, block):
+        e = min(s + block, n)
+        for t in range(0, n, block):
+            f = min(t + block, n)
+            d2 = sq[s:e, None] + sq[None, t:f] - 2.0 * (x[s:e] @ x[t:f].T)
+            np.maximum(d2, 0.0, out=d2)
+            d2[ids[s:e, None] == ids[None, t:f]] = np.inf  # Only cross-student distances matter here
+            best = np.argmin(d2, axis=1)
+            best_d2 = d2[np.arange(e - s), best]
+            closer = best_d2 < nearest_other[s:e]
+            nearest_other[s:e][closer] = best_d2[closer]
+            nearest_other_row[s:e][closer] = best[closer] + t
+            if t < s:
+                continue  # The mirrored block already reported these pairs
+            if t == s:
+                d2[np.tril_indices(e - s, m=f - t)] = np.inf
+            for i, j in zip(*np.nonzero(d2 < threshold_sq)):
+                a, b = s + i, t + j
+                key = (ids[a], ids[b]) if ids[a] < ids[b] else (ids[b], ids[a])
+                distance = float(np.sqrt(d2[i, j]))
+                entry = pairs.get(key)
+                if entry is None:
+                    pairs[key] = entry = {"count": 0, "distance": np.inf}
+                entry["count"] += 1
+                if distance < entry["distance"]:
+                    first, second = (a, b) if ids[a] == key[0] else (b, a)
+                    entry.update(distance=distance, photo=photos[first], other_photo=photos[second])
+
+    centroids = np.zeros((len(students), x.shape[1]), dtype=np.float64)
+    np.add.at(centroids, ids, x)
+    counts = np.bincount(ids, minlength=len(students))
+    centroids /= counts[:, None]
+    centroid_distance = np.linalg.norm(x - centroids[ids], axis=1)
+    nearest_other_distance = np.sqrt(nearest_other)
+
+    outliers = []
+    for row in range(n):
+        far = counts[ids[row]] > 1 and centroid_distance[row] > outlier_distance
+        other = nearest_other_distance[row] < threshold and nearest_other_distance[row] < centroid_distance[row]
+        if not (far or other):
+            continue
+        other_row = nearest_other_row[row]
+        outliers.append({
+            "roll_no": str(students[ids[row]]),
+            "photo": photos[row],
+            "centroid_distance": float(centroid_distance[row]),
+            "nearest_other_roll_no": str(students[ids[other_row]]) if other_row >= 0 else None,
+            "nearest_other_distance": float(nearest_other_distance[row]) if other_row >= 0 else None,
+            "reason": "closer to another student" if other else "far from own photos",
+        })
+
+    return {
+        "gallery": n,
+        "students": len(students),
+        "threshold": threshold,
+        "outlier_distance": outlier_distance,
+        "pairs": sorted(
+            ({"roll_no": str(students[a]), "other_roll_no": str(students[b]), **entry} for (a, b), entry in pairs.items()),
+            key=lambda p: p["distance"],
+        ),
+        "outliers": sorted(outliers, key=lambda o: (o["reason"], -o["centroid_distance"])),
+    }
+
+def write_report(report, base=GALLERY_REPORT):
+    """Write base.json (everything) and base.csv (one row per pair or outlier); returns both paths."""
+    json_path, csv_path = f"{base}.json", f"{base}.csv"
+    with open(json_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    with open(csv_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["kind", "roll_no", "other_roll_no", "distance", "photo", "other_photo", "detail"])
+        for p in report["pairs"]:
+            writer.writerow(["confusable", p["roll_no"], p["other_roll_no"], f"{p['distance']:.4f}",
+                             p["photo"], p["other_photo"], f"{p['count']} photo pairs under threshold"])
+        for o in report["outliers"]:
+            other_distance = "" if o["nearest_other_distance"] is None else f"{o['nearest_other_distance']:.4f}"
+            writer.writerow(["outlier", o["roll_no"], o["nearest_other_roll_no"] or "", other_distance,
+                             o["photo"], "", f"{o['reason']}; {o['centroid_distance']:.4f} from own centroid"])
+    logging.info(f"Wrote gallery report to {json_path} and {csv_path}")
+    return json_path, csv_path
+
+def run_report(manifest_file=MANIFEST_FILE, base=GALLERY_REPORT, threshold=MATCH_THRESHOLD, outlier_distance=OUTLIER_DISTANCE):
+    """Analyze every enrollment photo in the training manifest and write the report; returns it."""
+    photos, encodings, roll_numbers = photo_encodings(manifest_file)
+    start = time.perf_counter()
+    report = analyze(encodings, roll_numbers, photos, threshold, outlier_distance)
+    report["seconds"] = time.perf_counter() - start
+    write_report(report, base)
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List students whose photos are confusable and enrollment photos that look wrong.")
+    parser.add_argument("--manifest", default=MANIFEST_FILE)
+    parser.add_argument("--threshold", type=float, default=MATCH_THRESHOLD)
+    parser.add_argument("--outlier-distance", type=float, default=OUTLIER_DISTANCE)
+    parser.add_argument("--out", default=GALLERY_REPORT, help="Report path without extension")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    report = run_report(args.manifest, args.out, args.threshold, args.outlier_distance)
+    print(f"{report['gallery']} photos of {report['students']} students analyzed in {report['seconds']:.1f}s")
+    print(f"{len(report['pairs'])} confusable student pairs, {len(report['outliers'])} suspicious photos")
+    for p in report["pairs"][:10]:
+        print(f"  {p['roll_no']} ~ {p['other_roll_no']}: {p['distance']:.3f} ({p['photo']} / {p['other_photo']})")
+    for o in report["outliers"][:10]:
+        print(f"  {o['photo']}: {o['reason']} ({o['centroid_distance']:.3f} from own centroid)")
+    print(f"Full report in {args.out}.json and {args.out}.csv")
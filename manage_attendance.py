@@ -3,10 +3,10 @@ import mysql.connector
 import logging
 from datetime import datetime
 import re
-import threading
 import pandas as pd
 import io
 from db_connection import DatabaseConnection
+from ui_scheduler import UIUpdateScheduler
 import base64
 import os
 from sendgrid import SendGridAPIClient
@@ -90,14 +90,16 @@ def main_manage(page: ft.Page, teacher_id=1):
 
         status_text = ft.Text("", color=ft.colors.GREEN_400, size=16, text_align=ft.TextAlign.CENTER)
 
+        # A status change is followed by a table refresh; both go out in one page update
+        ui = UIUpdateScheduler(page)
+
         def clear_status_text():
             status_text.value = ""
-            page.update()
 
         def set_status_text(message, duration=3):
             status_text.value = message
-            page.update()
-            threading.Timer(duration, clear_status_text).start()
+            ui.request()
+            ui.call_later("status", duration, clear_status_text)
 
         def update_selected_date(date_value):
             logging.debug(f"Date input changed to: {date_value}")
@@ -166,7 +168,7 @@ def main_manage(page: ft.Page, teacher_id=1):
                         )
                         for course_id, course_name, section_id, section_name in course_sections
                     ]
-                    page.update()
+                    ui.request()
                     update_table()
             except Exception as e:
                 show_alert_dialog("Error", f"Error fetching courses and sections: {e}")
@@ -414,7 +416,7 @@ def main_manage(page: ft.Page, teacher_id=1):
                         )
                     )
                 logging.debug(f"Table updated with {len(data_table.rows)} rows")
-                page.update()
+                ui.request()
             except Exception as e:
                 logging.debug(f"Error fetching data: {e}")
                 show_alert_dialog("Error", f"Error fetching students: {e}")
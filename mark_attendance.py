@@ -1,22 +1,30 @@
 import flet as ft
 import mysql.connector
 import cv2
-import numpy as np
-import face_recognition
-import pickle
 import logging
 from datetime import datetime
-import winsound
 import os
 import platform
-import cvzone
-import pyttsx3
-import threading
 import time
 import pandas as pd
 import io
 import base64
 from db_connection import DatabaseConnection
+from face_matcher import FaceMatcher
+from embedding_store import store_stamp
+from gallery_reloader import GalleryReloader
+from embedding_sync import sync_embeddings
+from attendance_session import AttendanceSession
+from attendance_recognizer import AttendanceRecognizer
+from recognition_pipeline import RecognitionPipeline
+from face_tracker import FaceTracker
+from motion_gate import MotionGate
+from detector_profiles import load_profile
+from stage_metrics import create_metrics
+from preview_server import PreviewPublisher, MJPEGServer, draw_overlays
+from ann_index import ANN_INDEX_FILE
+from audio_feedback import get_audio_feedback
+from ui_scheduler import UIUpdateScheduler
 from sendgrid import SendGridAPIClient
 from sendgrid.helpers.mail import Mail, Attachment, FileContent, FileName, FileType, Disposition
 from back_button import create_back_button
@@ -24,45 +32,22 @@ from teacher_dashboard import teacher_dashboard
 from manage_attendance import main_manage  # Import manage_attendance module
 
 # Constants
-ENCODE_FILE = "EncodeFile.p"
+ENCODE_FILE = "EncodeFile.npy"  # Migrated from EncodeFile.p on first load
 FACE_DISTANCE_THRESHOLD = 0.6
-SOUND_FILE = "beep.wav"
 CAMERA_TIMEOUT = 300  # Timeout in seconds (5 minutes)
-
-# Initialize TTS engine
-tts_engine = pyttsx3.init()
-tts_engine.setProperty('rate', 150)
+GALLERY_CHECK_SECONDS = 10  # How often a running session looks for a retrained gallery to swap in
+PREVIEW_MODE = None  # "window", "flet" or "mjpeg"; None picks one for the environment
+REPORT_OTHER_SECTIONS = False  # Slower second pass over the full gallery to label "not in section" faces
+ANNOUNCE_MARKS = False  # Speak the marked name (or count for a burst) after the beep
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG, format="%(asctime)s - %(levelname)s - %(message)s")
 
-def play_beep_sound():
-    logging.debug("Starting play_beep_sound")
-    try:
-        if platform.system() == "Windows":
-            winsound.Beep(1000, 200)
-        else:
-            if os.path.exists(SOUND_FILE):
-                os.system(f"aplay {SOUND_FILE}")
-            else:
-                logging.warning("Sound file not found for non-Windows system.")
-        logging.debug("Finished play_beep_sound")
-    except Exception as e:
-        logging.error(f"Failed to play sound: {str(e)}")
-
-def play_tts_message(message):
-    logging.debug(f"Starting play_tts_message: {message}")
-    try:
-        tts_engine.say(message)
-        tts_engine.runAndWait()
-        logging.debug("Finished play_tts_message")
-    except Exception as e:
-        logging.error(f"Failed to play TTS message: {str(e)}")
-
-def run_in_thread(func, *args):
-    """Run a function in a separate thread to prevent blocking."""
-    thread = threading.Thread(target=func, args=args, daemon=True)
-    thread.start()
+def has_display():
+    """False on Linux machines with no X11/Wayland session, where cv2.imshow cannot open a window."""
+    if platform.system() != "Linux":
+        return True
+    return bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
 
 def main(page: ft.Page, teacher_id=1):
     logging.debug("Starting manage_attendance application")
@@ -100,13 +85,23 @@ def main(page: ft.Page, teacher_id=1):
         dialog.open = True
         page.update()
 
+    def load_matcher():
+        matcher = FaceMatcher.from_file(ENCODE_FILE)
+        matcher.load_index(ANN_INDEX_FILE)  # Used by the full-gallery pass only; section subsets search exactly
+        return matcher
+
+    # Bring the local copy of the encodings up to date; without the database it is used as is
+    try:
+        sync_embeddings(ENCODE_FILE, ANN_INDEX_FILE)
+    except Exception as e:
+        logging.warning(f"Failed to sync face encodings, using the local copy: {str(e)}")
+
     # Load face encodings
     try:
-        with open(ENCODE_FILE, 'rb') as file:
-            encode_list_known, roll_numbers = pickle.load(file)
-        logging.debug(f"Loaded {len(encode_list_known)} encodings from {ENCODE_FILE}")
-        if not encode_list_known:
-            show_alert_dialog("Error", "No face encodings found in EncodeFile.p")
+        gallery_stamp = store_stamp(ENCODE_FILE)
+        matcher = load_matcher()
+        if len(matcher) == 0:
+            show_alert_dialog("Error", f"No face encodings found in {ENCODE_FILE}")
             return
     except Exception as e:
         show_alert_dialog("Error", f"Failed to load encodings: {str(e)}")
@@ -131,14 +126,16 @@ def main(page: ft.Page, teacher_id=1):
     # Text control for status messages
     status_text = ft.Text("", color=ft.colors.GREEN_400, size=16, text_align=ft.TextAlign.CENTER)
 
+    # Marks can arrive in bursts from the camera loop; their status updates share page updates
+    ui = UIUpdateScheduler(page)
+
     def clear_status_text():
         status_text.value = ""
-        page.update()
 
     def set_status_text(message, duration=3):
         status_text.value = message
-        page.update()
-        threading.Timer(duration, clear_status_text).start()
+        ui.request()
+        ui.call_later("status", duration, clear_status_text)  # Replaces the previous message's timer
 
     def fetch_teacher_courses():
         logging.debug("Fetching teacher courses")
@@ -167,88 +164,14 @@ def main(page: ft.Page, teacher_id=1):
             logging.error(f"Database error: {err}")
             show_alert_dialog("Error", f"Database Error: {err}")
 
-    def fetch_students(course_id, section_id):
-        logging.debug(f"Fetching students for CourseID {course_id}, SectionID {section_id}")
-        try:
-            with DatabaseConnection() as conn:
-                cursor = conn.cursor()
-                query = """
-                    SELECT s.Roll_no
-                    FROM student s
-                    WHERE s.SectionID = %s
-                """
-                cursor.execute(query, (section_id,))
-                students = [row[0] for row in cursor.fetchall()]
-                
-                logging.debug(f"Fetched students: {students}")
-                return students
-        except mysql.connector.Error as err:
-            logging.error(f"Database error: {err}")
-            show_alert_dialog("Error", f"Database Error: {err}")
-            return []
-
-    def fetch_student_details(roll_no):
-        logging.debug(f"Fetching details for Roll No {roll_no}")
-        try:
-            with DatabaseConnection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT Roll_no, Full_Name FROM student WHERE Roll_no=%s", (roll_no,))
-                result = cursor.fetchone()
-                
-                if result:
-                    logging.debug(f"Found student: {result}")
-                    return result[0], result[1]
-                logging.debug(f"No student found for Roll No {roll_no}")
-                return roll_no, "Unknown"
-        except mysql.connector.Error as err:
-            logging.error(f"Database error: {err}")
-            show_alert_dialog("Error", f"Database Error: {err}")
-            return roll_no, "Unknown"
-
-    def check_if_already_marked(roll_no, course_id, section_id, teacher_id):
-        logging.debug(f"Checking if attendance already marked for Roll No {roll_no}")
-        try:
-            with DatabaseConnection() as conn:
-                cursor = conn.cursor()
-                query = """
-                    SELECT COUNT(*) FROM attendance
-                    WHERE Roll_no=%s 
-                    AND CourseID=%s 
-                    AND SectionID=%s 
-                    AND Teacher_ID=%s 
-                    AND DATE(Attendance_Date)=CURDATE()
-                """
-                cursor.execute(query, (roll_no, course_id, section_id, teacher_id))
-                count = cursor.fetchone()[0]
-                
-                logging.debug(f"Attendance marked: {'Yes' if count > 0 else 'No'}")
-                return count > 0
-        except mysql.connector.Error as err:
-            logging.error(f"Database error: {err}")
-            show_alert_dialog("Error", f"Database Error: {err}")
-            return False
-
-    def mark_attendance(roll_no, course_id, section_id, status, name):
+    def mark_attendance(session, roll_no, status, name):
         logging.debug(f"Marking attendance for Roll No {roll_no}, Status: {status}")
-        try:
-            with DatabaseConnection() as conn:
-                cursor = conn.cursor()
-                now = datetime.now()
-                date = now.date()
-                time = now.time()
-                cursor.execute("""
-                    INSERT INTO attendance (Teacher_ID, CourseID, SectionID, Roll_no, Attendance_Date, Attendance_Time, Status)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
-                """, (teacher_id, course_id, section_id, roll_no, date, time, status))
-                conn.commit()
-                
-                logging.info(f"Marked {status} for Roll No: {roll_no}")
-                if status == "Present":
-                    run_in_thread(play_beep_sound)  # Run in thread
-                    # run_in_thread(play_tts_message, f"Attendance marked for {name}")  # Run in thread
-        except mysql.connector.Error as err:
-            logging.error(f"Database error: {err}")
-            show_alert_dialog("Error", f"Database Error: {err}")
+        session.mark(roll_no, status)  # Written in the background by the session's writer
+        if status == "Present":
+            get_audio_feedback(ANNOUNCE_MARKS).notify_marked(name)
+
+    def report_write_error(roll_numbers, err):
+        show_alert_dialog("Error", f"Database Error: {err}\nNot saved: {', '.join(roll_numbers)}")
 
     def complete_attendance(e):
         logging.debug("Complete Attendance button clicked")
@@ -404,21 +327,48 @@ def main(page: ft.Page, teacher_id=1):
     stop_camera = False
 
     def mark_attendance_with_camera(e):
-        nonlocal stop_camera
+        nonlocal stop_camera, matcher, gallery_stamp
         stop_camera = False
         logging.debug("Starting mark_attendance_with_camera")
 
+        # Pick up a gallery retrained (e.g. by train_headless.py) since the page was opened
+        if store_stamp(ENCODE_FILE) != gallery_stamp:
+            try:
+                gallery_stamp = store_stamp(ENCODE_FILE)
+                matcher = load_matcher()
+                logging.info(f"Reloaded {len(matcher)} face encodings")
+            except Exception as err:
+                logging.error(f"Failed to reload encodings, keeping the previous ones: {str(err)}")
+
         if not course_dropdown.value:
             show_alert_dialog("Error", "Please select a course and section!")
             logging.debug("No course selected")
             return
 
         course_id, section_id = map(int, course_dropdown.value.split(":"))
-        present_students = set()
+
+        metrics = create_metrics()  # Per-stage timings, dumped under metrics/ when the session ends
+
+        # Roster and today's marks are loaded once; the DB is only touched again to write a new mark
+        try:
+            session = AttendanceSession(teacher_id, course_id, section_id, on_write_error=report_write_error).load(metrics=metrics)
+        except mysql.connector.Error as err:
+            logging.error(f"Database error: {err}")
+            show_alert_dialog("Error", f"Database Error: {err}")
+            return
+
+        # Only this section's students can be marked, so match against their encodings alone
+        section_matcher = matcher.subset(session.roster)
+        if len(section_matcher) == 0:
+            session.close()
+            show_alert_dialog("Error", "No trained face encodings for students in this section!")
+            logging.debug(f"No encodings for section {section_id}")
+            return
         start_time = time.time()
 
         cap = cv2.VideoCapture(0)
         if not cap.isOpened():
+            session.close()
             show_alert_dialog("Error", "Could not open camera!")
             logging.error("Camera could not be opened")
             return
@@ -444,6 +394,56 @@ def main(page: ft.Page, teacher_id=1):
             page.update()
             logging.debug("Stop camera button clicked")
 
+        # Identities stay on tracks between detections, so only new or unidentified faces are matched
+        tracker = FaceTracker()
+
+        def on_mark(roll_no, name):
+            mark_attendance(session, roll_no, "Present", name)
+            set_status_text(f"Marked Present for Roll No: {roll_no}")
+
+        recognize_faces = AttendanceRecognizer(
+            session, section_matcher, tracker, on_mark,
+            other_matcher=matcher if REPORT_OTHER_SECTIONS else None,
+            candidate_threshold=FACE_DISTANCE_THRESHOLD,
+        )
+
+        # A gallery retrained during the session is loaded and sliced off the camera loop
+        def load_section_gallery():
+            new_matcher = load_matcher()
+            return new_matcher, new_matcher.subset(session.roster)
+
+        reloader = GalleryReloader(load_section_gallery, gallery_stamp, ENCODE_FILE, GALLERY_CHECK_SECONDS,
+                                   sync=lambda: sync_embeddings(ENCODE_FILE, ANN_INDEX_FILE)).start()
+
+        # Without a desktop the annotated feed goes to the page or a local MJPEG endpoint instead of cv2.imshow
+        preview_mode = PREVIEW_MODE or ("flet" if page.web else "window" if has_display() else "mjpeg")
+        preview = preview_server = None
+        if preview_mode == "flet":
+            preview_image = ft.Image(width=640, height=360, fit=ft.ImageFit.CONTAIN, gapless_playback=True, visible=False)
+            page.controls.append(preview_image)
+            page.update()
+
+            def show_preview(jpeg):
+                preview_image.src_base64 = base64.b64encode(jpeg).decode()
+                preview_image.visible = True
+                preview_image.update()
+
+            preview = PreviewPublisher(on_jpeg=show_preview, metrics=metrics).start()
+        elif preview_mode == "mjpeg":
+            preview = PreviewPublisher(metrics=metrics).start()
+            try:
+                preview_server = MJPEGServer(preview).start()
+                set_status_text(f"Camera preview at {preview_server.url}", duration=10)
+            except OSError as err:
+                logging.error(f"Could not start preview server: {err}")
+        logging.debug(f"Camera preview mode: {preview_mode}")
+
+        # Grabbing and encoding run in the background; this loop only matches, draws and displays
+        motion_gate = MotionGate()
+        pipeline = RecognitionPipeline(
+            cap, profile=load_profile(), tracker=tracker, motion_gate=motion_gate, metrics=metrics
+        ).start()
+
         while not stop_camera:
             # Check for timeout
             if time.time() - start_time > CAMERA_TIMEOUT:
@@ -451,71 +451,72 @@ def main(page: ft.Page, teacher_id=1):
                 show_alert_dialog("Timeout", "Camera session timed out after 5 minutes.")
                 break
 
-            logging.debug("Reading camera frame")
-            ret, frame = cap.read()
-            if not ret:
-                show_alert_dialog("Error", "Failed to capture video frame!")
-                logging.error("Failed to capture video frame")
+            if pipeline.error:
+                show_alert_dialog("Error", pipeline.error)
                 break
 
-            # Resize frame for faster processing
-            small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
-            rgb_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
-
-            logging.debug("Detecting faces")
-            face_locations = face_recognition.face_locations(rgb_frame)
-            face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
-            face_locations = [(top*4, right*4, bottom*4, left*4) for (top, right, bottom, left) in face_locations]
-
-            logging.debug(f"Detected {len(face_locations)} faces in the frame")
-
-            for face_encoding, (top, right, bottom, left) in zip(face_encodings, face_locations):
-                logging.debug("Processing face encoding")
-                matches = face_recognition.compare_faces(encode_list_known, face_encoding, tolerance=FACE_DISTANCE_THRESHOLD)
-                face_distances = face_recognition.face_distance(encode_list_known, face_encoding)
-                best_match_index = np.argmin(face_distances)
-
-                bbox = (left, top, right - left, bottom - top)
-                label = "Unknown"
-                color = (0, 0, 255)
-
-                if face_distances[best_match_index] < 0.4:
-                    roll_no = roll_numbers[best_match_index]
-                    logging.debug(f"Match found: Roll No {roll_no}, Distance: {face_distances[best_match_index]}")
-                    students_in_section = fetch_students(course_id, section_id)
-                    if roll_no in students_in_section:
-                        roll_no, name = fetch_student_details(roll_no)
-                        label = f"ID: {roll_no} ({name})"
-                        color = (0, 255, 0)
-                        if roll_no not in present_students:
-                            if not check_if_already_marked(roll_no, course_id, section_id, teacher_id):
-                                present_students.add(roll_no)
-                                logging.debug(f"Marking attendance for Roll No {roll_no}")
-                                mark_attendance(roll_no, course_id, section_id, "Present", name)
-                                set_status_text(f"Marked Present for Roll No: {roll_no}")
-                            else:
-                                logging.debug(f"Roll No {roll_no} already marked today")
-                    else:
-                        logging.debug(f"Roll No {roll_no} not in section {section_id}")
-                        label = "Unknown"
-                        color = (0, 0, 255)
+            # Swap between detection results; dropping the old matchers releases the old gallery
+            reloaded = reloader.take()
+            if reloaded is not None:
+                new_stamp, (new_matcher, new_section_matcher) = reloaded
+                if len(new_section_matcher) == 0:
+                    logging.warning("Retrained gallery has no encodings for this section, keeping the current one")
                 else:
-                    logging.debug("No match found for face")
+                    gallery_stamp, matcher, section_matcher = new_stamp, new_matcher, new_section_matcher
+                    recognize_faces.swap_gallery(section_matcher, matcher if REPORT_OTHER_SECTIONS else None)
+                    set_status_text(f"Switched to retrained face encodings ({len(section_matcher)} for this section)")
+
+            for frame_id, face_locations, face_encodings in pipeline.results():
+                with metrics.stage("match"):
+                    recognize_faces(frame_id, face_locations, face_encodings)
 
-                cvzone.cornerRect(frame, bbox, rt=0, colorR=color)
-                x, y, w, h = bbox
-                cvzone.putTextRect(frame, label, (x, y - 20), scale=1, thickness=2, colorR=color)
+            frame = pipeline.latest_frame(timeout=0.1)
+            if frame is None:
+                continue
 
-            logging.debug("Displaying frame")
-            cv2.imshow("Face Recognition Attendance", frame)
+            overlays = []
+            for track in tracker.visible_tracks():
+                top, right, bottom, left = track.box
+                overlays.append(((left, top, right - left, bottom - top), track.label, track.color))
 
-            if cv2.waitKey(1) & 0xFF == ord('q'):
+            metrics.frame()
+
+            if preview is not None:
+                preview.submit(frame, overlays)  # Drawn and encoded on the preview thread
+                continue
+
+            # The dispatcher may still be reading the grabbed frame, so draw on a copy
+            with metrics.stage("draw"):
+                annotated = draw_overlays(frame.copy(), overlays)
+            with metrics.stage("display"):
+                cv2.imshow("Face Recognition Attendance", annotated)
+                key = cv2.waitKey(1) & 0xFF
+
+            if key == ord('q'):
                 logging.debug("Quit key pressed")
                 stop_camera = True
 
+        logging.debug(f"Tracker: {tracker.detections} detections, {tracker.encoded} faces encoded, {tracker.skipped} skipped")
+        logging.debug(f"Motion gate: {motion_gate.stats()}")
+        pipeline.stop()
         logging.debug("Releasing camera")
         cap.release()
-        cv2.destroyAllWindows()
+        reloader.stop()  # After the camera, so a sync stuck on the database cannot hold it
+        if preview_server is not None:
+            preview_server.stop()
+        if preview is not None:
+            preview.stop()
+            if preview_mode == "flet":
+                page.controls.remove(preview_image)
+        else:
+            cv2.destroyAllWindows()
+        session.close()  # Drain queued marks before leaving the session
+        if metrics.enabled:
+            logging.info(f"Session metrics: {metrics.summary()}")
+            try:
+                metrics.dump()
+            except OSError as err:
+                logging.error(f"Failed to write session metrics: {err}")
         page.controls.remove(stop_button)
         page.update()
         logging.debug("Camera loop ended")
@@ -0,0 +1,53 @@
+import time
+import logging
+import cv2
+
+logging.basicConfig(level=logging.DEBUG, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Constants
+PIXEL_DELTA = 25  # Grey-level change for a pixel to count as moved
+MOTION_FRACTION = 0.01  # Fraction of moved pixels that counts as a changed frame
+FORCE_EVERY = 2.0  # Seconds after which a frame is processed even if nothing moved
+
+class MotionGate:
+    """Skips face detection while the downscaled frame matches the last processed one."""
+
+    def __init__(self, pixel_delta=PIXEL_DELTA, motion_fraction=MOTION_FRACTION, force_every=FORCE_EVERY):
+        self.pixel_delta = pixel_delta
+        self.motion_fraction = motion_fraction
+        self.force_every = force_every
+        self.processed = 0
+        self.skipped = 0
+        self.forced = 0
+        self.bypassed = 0
+        self._reference = None
+        self._last_processed = 0.0
+
+    def should_process(self, small_frame, bypass=False):
+        """Return (process, gray) for a downscaled BGR frame; call accept(gray) once it is processed.
+
+        bypass processes the frame whatever moved, e.g. while a face still needs votes to be identified.
+        """
+        gray = cv2.cvtColor(small_frame, cv2.COLOR_BGR2GRAY)
+        if bypass:
+            self.bypassed += 1
+            return True, gray
+        if self._reference is None or self._reference.shape != gray.shape:
+            return True, gray
+        if time.monotonic() - self._last_processed >= self.force_every:
+            self.forced += 1
+            return True, gray
+        moved = cv2.countNonZero(cv2.threshold(cv2.absdiff(gray, self._reference), self.pixel_delta, 255, cv2.THRESH_BINARY)[1])
+        if moved >= self.motion_fraction * gray.size:
+            return True, gray
+        self.skipped += 1
+        return False, gray
+
+    def accept(self, gray):
+        """Make gray the reference for the next comparison."""
+        self._reference = gray
+        self._last_processed = time.monotonic()
+        self.processed += 1
+
+    def stats(self):
+        return {"processed": self.processed, "skipped": self.skipped, "forced": self.forced, "bypassed": self.bypassed}
@@ -0,0 +1,175 @@
+import threading
+import time
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import cv2
+import cvzone
+from stage_metrics import NULL_METRICS
+
+logging.basicConfig(level=logging.DEBUG, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Constants
+PREVIEW_FPS = 10  # Cap on preview frames encoded per second
+PREVIEW_WIDTH = 640  # Preview frames are downscaled to at most this width
+JPEG_QUALITY = 70
+PREVIEW_HOST = "127.0.0.1"
+PREVIEW_PORT = 8081
+
+def draw_overlays(frame, overlays):
+    """Draw (bbox, label, color) face boxes on a frame in place."""
+    for bbox, label, color in overlays:
+        x, y, w, h = bbox
+        cvzone.cornerRect(frame, bbox, rt=0, colorR=color)
+        cvzone.putTextRect(frame, label, (x, y - 20), scale=1, thickness=2, colorR=color)
+    return frame
+
+class PreviewPublisher:
+    """Draws and JPEG-encodes annotated frames on its own thread at a capped rate.
+
+    submit() only swaps a reference, so recognition never waits for the preview; frames
+    submitted faster than the cap are simply replaced by newer ones.
+    on_jpeg(bytes) is called from the publisher thread for every encoded frame.
+    """
+
+    def __init__(self, fps=PREVIEW_FPS, max_width=PREVIEW_WIDTH, quality=JPEG_QUALITY, on_jpeg=None, metrics=NULL_METRICS):
+        self.interval = 1.0 / fps
+        self.max_width = max_width
+        self.quality = quality
+        self.on_jpeg = on_jpeg
+        self.metrics = metrics
+        self.published = 0
+        self._cond = threading.Condition()
+        self._pending = None
+        self._jpeg = None
+        self._jpeg_id = 0
+        self._running = False
+        self._thread = threading.Thread(target=self._run, name="preview-publisher", daemon=True)
+
+    def start(self):
+        self._running = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        self._thread.join(timeout=2)
+
+    @property
+    def running(self):
+        return self._running
+
+    def submit(self, frame, overlays):
+        with self._cond:
+            self._pending = (frame, list(overlays))
+            self._cond.notify_all()
+
+    def wait_jpeg(self, last_id, timeout=None):
+        """Return (jpeg_id, bytes) for a frame newer than last_id, or None on timeout/stop."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._jpeg_id > last_id or not self._running, timeout)
+            if self._jpeg_id > last_id:
+                return self._jpeg_id, self._jpeg
+            return None
+
+    def _run(self):
+        next_due = 0.0
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending is not None or not self._running)
+                if not self._running:
+                    return
+            delay = next_due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)  # Rate cap; newer submissions keep replacing the pending frame
+            with self._cond:
+                frame, overlays = self._pending
+                self._pending = None
+            next_due = time.monotonic() + self.interval
+
+            with self.metrics.stage("draw"):
+                annotated = draw_overlays(frame.copy(), overlays)
+            with self.metrics.stage("display"):
+                height, width = annotated.shape[:2]
+                if width > self.max_width:
+                    annotated = cv2.resize(annotated, (self.max_width, int(height * self.max_width / width)))
+                ok, buffer = cv2.imencode(".jpg", annotated, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+            if not ok:
+                continue
+            jpeg = buffer.tobytes()
+            with self._cond:
+                self._jpeg = jpeg
+                self._jpeg_id += 1
+                self._cond.notify_all()
+            self.published += 1
+            if self.on_jpeg:
+                try:
+                    self.on_jpeg(jpeg)
+                except Exception as e:
+                    logging.error(f"Preview callback failed: {str(e)}")
+
+class _PreviewHandler(BaseHTTPRequestHandler):
+    publisher = None
+
+    def do_GET(self):
+        if self.path == "/":
+            body = b'<html><body style="margin:0;background:#000"><img src="/stream" style="width:100%"></body></html>'
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path == "/snapshot.jpg":
+            got = self.publisher.wait_jpeg(0, timeout=2)
+            if got is None:
+                self.send_error(503, "No preview frame yet")
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            self.send_header("Content-Length", str(len(got[1])))
+            self.end_headers()
+            self.wfile.write(got[1])
+        elif self.path == "/stream":
+            self.send_response(200)
+            self.send_header("Content-Type", "multipart/x-mixed-replace; boundary=frame")
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            last_id = 0
+            try:
+                while True:
+                    got = self.publisher.wait_jpeg(last_id, timeout=5)
+                    if got is None:
+                        if not self.publisher.running:
+                            break
+                        continue
+                    last_id, jpeg = got
+                    self.wfile.write(b"--frame\r\nContent-Type: image/jpeg\r\n")
+                    self.wfile.write(f"Content-Length: {len(jpeg)}\r\n\r\n".encode())
+                    self.wfile.write(jpeg + b"\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                logging.debug("Preview client disconnected")
+        else:
+            self.send_error(404)
+
+    def log_message(self, format, *args):
+        logging.debug(f"Preview server: {format % args}")
+
+class MJPEGServer:
+    """Serves a publisher's frames at http://host:port/ (page), /stream (MJPEG) and /snapshot.jpg."""
+
+    def __init__(self, publisher, host=PREVIEW_HOST, port=PREVIEW_PORT):
+        handler = type("PreviewHandler", (_PreviewHandler,), {"publisher": publisher})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://{host}:{self.httpd.server_address[1]}/"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="mjpeg-server", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        logging.info(f"Camera preview at {self.url}")
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,240 @@
+import os
+import queue
+import threading
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+import face_recognition
+from face_tracker import iou
+from detector_profiles import DEFAULT_PROFILE
+from stage_metrics import NULL_METRICS
+
+logging.basicConfig(level=logging.DEBUG, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Constants
+DEFAULT_WORKERS = max(1, (os.cpu_count() or 2) - 1)  # Leave one core for grabbing and rendering
+MAX_PENDING_RESULTS = 4
+SKIP_IOU = 0.5  # A detection overlapping a confirmed track this much is not re-encoded
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_worker_pool(workers=DEFAULT_WORKERS):
+    """Process pool shared by all sessions, so workers only pay the dlib start-up cost once."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            logging.debug(f"Starting {workers} face encoding workers")
+            _pool = ProcessPoolExecutor(max_workers=workers)
+        return _pool
+
+def detect_faces(rgb_small, profile=DEFAULT_PROFILE):
+    return face_recognition.face_locations(rgb_small, number_of_times_to_upsample=profile.upsample, model=profile.model)
+
+def encode_faces(rgb_small, locations, skip_boxes=None, profile=DEFAULT_PROFILE):
+    """Encode the faces at locations, with None for any face overlapping one of skip_boxes."""
+    to_encode = locations
+    if skip_boxes:
+        to_encode = [loc for loc in locations if max(iou(loc, box) for box in skip_boxes) < SKIP_IOU]
+    encodings = face_recognition.face_encodings(
+        rgb_small, to_encode, num_jitters=profile.num_jitters, model=profile.landmarks
+    ) if to_encode else []
+    if not skip_boxes:
+        return encodings
+    encoded = dict(zip(to_encode, encodings))
+    return [encoded.get(loc) for loc in locations]
+
+def detect_and_encode(rgb_small, skip_boxes=None, profile=DEFAULT_PROFILE):
+    """Worker task: detect all faces in a downscaled RGB frame and encode the ones not already identified.
+
+    Returns (locations, encodings) with None in place of the encoding of any face that overlaps
+    one of skip_boxes (the boxes of confirmed tracks, in the same downscaled coordinates).
+    """
+    locations = detect_faces(rgb_small, profile)
+    return locations, encode_faces(rgb_small, locations, skip_boxes, profile)
+
+def timed_detect_and_encode(rgb_small, skip_boxes=None, profile=DEFAULT_PROFILE):
+    """detect_and_encode that also returns the worker's (detect_seconds, encode_seconds)."""
+    start = time.perf_counter()
+    locations = detect_faces(rgb_small, profile)
+    detected = time.perf_counter()
+    encodings = encode_faces(rgb_small, locations, skip_boxes, profile)
+    return locations, encodings, (detected - start, time.perf_counter() - detected)
+
+class LatestFrame:
+    """Single-slot frame buffer; a new frame replaces an unread one, so readers never fall behind."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._frame = None
+        self._frame_id = 0
+        self._closed = False
+
+    def put(self, frame):
+        with self._cond:
+            self._frame_id += 1
+            self._frame = frame
+            self._cond.notify_all()
+
+    def get_newer(self, last_id, timeout=None):
+        """Return (frame_id, frame) for a frame newer than last_id, or None on timeout/close."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._frame_id > last_id or self._closed, timeout)
+            if self._frame_id > last_id:
+                return self._frame_id, self._frame
+            return None
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+class RecognitionPipeline:
+    """Camera grabber -> detection/encoding worker pool -> consumer (match and render).
+
+    The grabber always keeps only the newest frame and the dispatcher hands a frame to the pool
+    only when a worker is free, so slow encoding drops frames instead of building latency.
+    The consumer shows every new frame with the most recent recognition results.
+    With a FaceTracker, frames are only detected when the tracker asks for it and faces on
+    confirmed tracks are not re-encoded. With a MotionGate, frames that did not change since
+    the last processed one are not detected at all. Stage timings go to metrics.
+    """
+
+    def __init__(self, capture, workers=DEFAULT_WORKERS, profile=DEFAULT_PROFILE, tracker=None, motion_gate=None,
+                 metrics=NULL_METRICS):
+        self.capture = capture
+        self.metrics = metrics
+        self.workers = workers
+        self.profile = profile
+        self.scale = profile.scale
+        self.tracker = tracker
+        self.motion_gate = motion_gate
+        self.error = None
+        self._frames = LatestFrame()
+        self._results = queue.Queue(maxsize=MAX_PENDING_RESULTS)
+        self._slots = threading.Semaphore(workers)
+        self._running = threading.Event()
+        self._threads = []
+        self._last_displayed = 0
+        self._last_result = 0
+
+    def start(self):
+        self._running.set()
+        self._pool = get_worker_pool(self.workers)
+        for target, name in ((self._grab_loop, "camera-grabber"), (self._dispatch_loop, "face-dispatcher")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        self._running.clear()
+        self._frames.close()
+        for thread in self._threads:
+            thread.join(timeout=2)
+        logging.debug("Recognition pipeline stopped")
+
+    @property
+    def running(self):
+        return self._running.is_set()
+
+    def latest_frame(self, timeout=None):
+        """Newest camera frame not yet returned, or None if none arrived within timeout."""
+        got = self._frames.get_newer(self._last_displayed, timeout)
+        if got is None:
+            return None
+        self._last_displayed, frame = got
+        return frame
+
+    def results(self):
+        """Drain finished recognition results as (frame_id, face_locations, face_encodings), oldest first.
+
+        Locations are scaled back to full-frame coordinates. Results older than one already
+        returned (a slow worker finishing late) are dropped.
+        """
+        finished = []
+        while True:
+            try:
+                finished.append(self._results.get_nowait())
+            except queue.Empty:
+                break
+        fresh = []
+        for frame_id, locations, encodings in sorted(finished, key=lambda r: r[0]):
+            if frame_id > self._last_result:
+                self._last_result = frame_id
+                fresh.append((frame_id, locations, encodings))
+        return fresh
+
+    def _grab_loop(self):
+        while self._running.is_set():
+            with self.metrics.stage("grab"):
+                ret, frame = self.capture.read()
+            if not ret:
+                self.error = "Failed to capture video frame!"
+                logging.error("Failed to capture video frame")
+                self._running.clear()
+                break
+            self._frames.put(frame)
+        self._frames.close()
+
+    def _dispatch_loop(self):
+        last_id = 0
+        while self._running.is_set():
+            if not self._slots.acquire(timeout=0.1):
+                continue
+            got = self._frames.get_newer(last_id, timeout=0.1)
+            if got is None:
+                self._slots.release()
+                continue
+            last_id, frame = got
+            resize_start = time.perf_counter()
+            small_frame = cv2.resize(frame, (0, 0), fx=self.scale, fy=self.scale)
+            if self.motion_gate is not None:
+                # Unconfirmed tracks need fresh encodings to vote even when nobody moves
+                voting = self.tracker is not None and self.tracker.voting()
+                changed, gray = self.motion_gate.should_process(small_frame, bypass=voting)
+                if not changed:
+                    self._slots.release()  # Nothing moved since the last processed frame
+                    continue
+            skip_boxes = None
+            if self.tracker is not None:
+                confirmed_boxes = self.tracker.plan(last_id)
+                if confirmed_boxes is None:
+                    self._slots.release()  # Tracks are settled, no detection needed for this frame
+                    continue
+                skip_boxes = [tuple(int(v * self.scale) for v in box) for box in confirmed_boxes]
+            rgb_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+            self.metrics.record("resize", time.perf_counter() - resize_start)
+            try:
+                future = self._pool.submit(timed_detect_and_encode, rgb_frame, skip_boxes, self.profile)
+            except RuntimeError as e:
+                logging.error(f"Failed to submit frame to workers: {str(e)}")
+                self._slots.release()
+                break
+            if self.motion_gate is not None:
+                self.motion_gate.accept(gray)
+            future.add_done_callback(lambda f, frame_id=last_id: self._on_result(frame_id, f))
+
+    def _on_result(self, frame_id, future):
+        self._slots.release()
+        try:
+            locations, encodings, (detect_seconds, encode_seconds) = future.result()
+        except Exception as e:
+            logging.error(f"Face encoding worker failed: {str(e)}")
+            return
+        self.metrics.record("detect", detect_seconds)
+        if locations:
+            self.metrics.record("encode", encode_seconds)
+        factor = 1.0 / self.scale
+        locations = [tuple(int(round(v * factor)) for v in location) for location in locations]
+        result = (frame_id, locations, encodings)
+        try:
+            self._results.put_nowait(result)
+        except queue.Full:
+            # Consumer is behind: drop the oldest result rather than block the worker callback
+            try:
+                self._results.get_nowait()
+            except queue.Empty:
+                pass
+            self._results.put_nowait(result)
@@ -0,0 +1,165 @@
+import os
+import json
+import time
+import bisect
+import threading
+import logging
+from datetime import datetime
+
+logging.basicConfig(level=logging.DEBUG, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Constants
+METRICS_ENABLED = os.getenv("ATTEND_METRICS", "1") != "0"  # ATTEND_METRICS=0 turns instrumentation off
+METRICS_DIR = "metrics"
+# Histogram bucket upper bounds in seconds: 0.1 ms to ~13 s, 25% apart
+BUCKETS = [0.0001 * 1.25 ** i for i in range(54)]
+
+class _Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # Last bucket is +Inf
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def percentile(self, q):
+        """q-th percentile in seconds, interpolated linearly inside its bucket."""
+        rank = q / 100.0 * self.count
+        cumulative = 0
+        for i, n in enumerate(self.counts):
+            if n and cumulative + n >= rank:
+                lower = BUCKETS[i - 1] if i > 0 else 0.0
+                if i == len(BUCKETS):
+                    return lower  # +Inf bucket: report its lower edge
+                return lower + (BUCKETS[i] - lower) * (rank - cumulative) / n
+            cumulative += n
+        return 0.0
+
+class _StageTimer:
+    __slots__ = ("metrics", "stage", "start")
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.metrics.record(self.stage, time.perf_counter() - self.start)
+
+class StageMetrics:
+    """Per-stage latency histograms and frame rate for one camera session; safe to use from any thread."""
+
+    enabled = True
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self.frames = 0
+
+    def record(self, stage, seconds):
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = _Histogram()
+            histogram.add(seconds)
+
+    def stage(self, name):
+        """Context manager timing the enclosed block as one sample of the named stage."""
+        return _StageTimer(self, name)
+
+    def frame(self):
+        """Count one displayed frame towards the session FPS."""
+        self.frames += 1
+
+    def summary(self):
+        elapsed = time.monotonic() - self._started
+        with self._lock:
+            stages = {
+                name: {
+                    "count": h.count,
+                    "mean_ms": 1000.0 * h.total / h.count,
+                    "p50_ms": 1000.0 * h.percentile(50),
+                    "p95_ms": 1000.0 * h.percentile(95),
+                    "p99_ms": 1000.0 * h.percentile(99),
+                }
+                for name, h in self._histograms.items()
+            }
+        return {"elapsed_s": elapsed, "frames": self.frames, "fps": self.frames / elapsed if elapsed else 0.0, "stages": stages}
+
+    def prometheus_text(self):
+        lines = [
+            "# HELP attendance_stage_seconds Time spent per recognition stage.",
+            "# TYPE attendance_stage_seconds histogram",
+        ]
+        with self._lock:
+            for name, h in sorted(self._histograms.items()):
+                cumulative = 0
+                for bound, n in zip(BUCKETS + [float("inf")], h.counts):
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else f"{bound:.6g}"
+                    lines.append(f'attendance_stage_seconds_bucket{{stage="{name}",le="{le}"}} {cumulative}')
+                lines.append(f'attendance_stage_seconds_sum{{stage="{name}"}} {h.total:.6f}')
+                lines.append(f'attendance_stage_seconds_count{{stage="{name}"}} {h.count}')
+        summary = self.summary()
+        lines += [
+            "# HELP attendance_fps Displayed frames per second over the session.",
+            "# TYPE attendance_fps gauge",
+            f"attendance_fps {summary['fps']:.3f}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def dump(self, directory=METRICS_DIR, name=None):
+        """Write <name>.prom and <name>.json into directory and return their paths."""
+        os.makedirs(directory, exist_ok=True)
+        name = name or f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        prom_path = os.path.join(directory, f"{name}.prom")
+        json_path = os.path.join(directory, f"{name}.json")
+        with open(prom_path, 'w') as f:
+            f.write(self.prometheus_text())
+        with open(json_path, 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+        logging.info(f"Wrote session metrics to {prom_path} and {json_path}")
+        return prom_path, json_path
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+_NULL_TIMER = _NullTimer()
+
+class NullMetrics:
+    """Drop-in for StageMetrics when instrumentation is off; every call is a no-op."""
+
+    enabled = False
+    frames = 0
+
+    def record(self, stage, seconds):
+        pass
+
+    def stage(self, name):
+        return _NULL_TIMER
+
+    def frame(self):
+        pass
+
+    def summary(self):
+        return {}
+
+    def dump(self, directory=METRICS_DIR, name=None):
+        return None
+
+NULL_METRICS = NullMetrics()
+
+def create_metrics(enabled=METRICS_ENABLED):
+    return StageMetrics() if enabled else NULL_METRICS
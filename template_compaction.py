@@ -0,0 +1,65 @@
+import logging
+import numpy as np
+
+logging.basicConfig(level=logging.DEBUG, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Constants
+OUTLIER_DISTANCE = 0.4  # A photo this far from its student's centroid is treated as a bad enrollment shot
+MEDOID_ITERATIONS = 10
+
+def _pairwise(points):
+    sq = np.einsum("ij,ij->i", points, points)
+    d = sq[:, None] + sq[None, :] - 2.0 * (points @ points.T)
+    np.maximum(d, 0.0, out=d)
+    return np.sqrt(d)
+
+def _medoids(points, k):
+    """Deterministic k-medoids: returns the row indices of k representative points."""
+    d = _pairwise(points)
+    medoids = [int(np.argmin(d.sum(axis=1)))]
+    while len(medoids) < k:
+        medoids.append(int(np.argmax(d[:, medoids].min(axis=1))))  # Farthest point from those chosen
+    for _ in range(MEDOID_ITERATIONS):
+        assign = np.argmin(d[:, medoids], axis=1)
+        updated = []
+        for c in range(k):
+            members = np.flatnonzero(assign == c)
+            updated.append(int(members[np.argmin(d[np.ix_(members, members)].sum(axis=1))]))
+        if updated == medoids:
+            break
+        medoids = updated
+    return medoids
+
+def compact_student(encodings, templates=1, outlier_distance=OUTLIER_DISTANCE):
+    """Reduce one student's encodings to at most templates rows.
+
+    Encodings farther than outlier_distance from the centroid are dropped first (the closest one
+    is always kept). One template is the centroid of the rest; more are k-medoids, i.e. real photos.
+    """
+    points = np.asarray(encodings, dtype=np.float32)
+    if len(points) <= 1:
+        return points
+    spread = np.linalg.norm(points - points.mean(axis=0), axis=1)
+    inliers = points[spread <= outlier_distance]
+    if len(inliers) == 0:
+        inliers = points[[int(np.argmin(spread))]]
+    if templates == 1:
+        return inliers.mean(axis=0, keepdims=True)
+    if len(inliers) <= templates:
+        return inliers
+    return inliers[_medoids(inliers, templates)]
+
+def compact_templates(encodings, roll_numbers, templates=1, outlier_distance=OUTLIER_DISTANCE):
+    """Compact every student's rows of a gallery; students keep the order of their first row."""
+    rows_by_student = {}
+    for i, roll_no in enumerate(roll_numbers):
+        rows_by_student.setdefault(roll_no, []).append(i)
+    points = np.asarray(encodings, dtype=np.float32)
+    compacted = []
+    compacted_rolls = []
+    for roll_no, rows in rows_by_student.items():
+        kept = compact_student(points[rows], templates, outlier_distance)
+        compacted.extend(kept)
+        compacted_rolls.extend([roll_no] * len(kept))
+    logging.debug(f"Compacted {len(roll_numbers)} encodings to {len(compacted_rolls)} for {len(rows_by_student)} students")
+    return compacted, compacted_rolls
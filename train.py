@@ -1,17 +1,18 @@
 import flet as ft
 import os
-import pickle
-import cv2
-import numpy as np
-import face_recognition
 import logging
 import asyncio
+import face_trainer
+import gallery_report
+import embedding_sync
 from back_button import create_back_button
+from ui_scheduler import UIUpdateScheduler
 from Dash import show_main
 
 # Constants
 IMAGE_DIR = "photos"
-ENCODE_FILE = "EncodeFile.p"
+ENCODE_FILE = "EncodeFile.npy"
+TEMPLATES_PER_STUDENT = None  # Set to 1 (centroid) or 2-3 (medoids) to compact each student's photos
 
 def main(page: ft.Page):
     # Configure logging
@@ -50,6 +51,7 @@ def main(page: ft.Page):
     # Progress bar components
     progress_bar = ft.ProgressBar(value=0, width=400, color=accent_color, bgcolor=ft.Colors.GREY_600, visible=False)
     progress_text = ft.Text("Training: 0%", color=ft.Colors.WHITE, size=14, visible=False)
+    ui = UIUpdateScheduler(page)  # Per-image progress is sent at most every UI_FLUSH_INTERVAL_MS
 
     def show_alert_dialog(title, message):
         dialog = ft.AlertDialog(
@@ -69,10 +71,7 @@ def main(page: ft.Page):
         page.update()
 
     async def train_classifier_async():
-        """Encode all faces in the Images directory and save to a pickle file asynchronously."""
-        encode_list = []
-        student_ids = []
-
+        """Bring the encodings up to date with the Images directory, encoding only new or changed photos."""
         if not os.path.exists(IMAGE_DIR):
             show_alert_dialog("Error", f"Directory {IMAGE_DIR} does not exist.")
             progress_bar.visible = False
@@ -80,68 +79,58 @@ def main(page: ft.Page):
             page.update()
             return
 
-        # Count total images for progress calculation
-        total_images = 0
-        for student_folder in os.listdir(IMAGE_DIR):
-            folder_path = os.path.join(IMAGE_DIR, student_folder)
-            if os.path.isdir(folder_path):
-                total_images += len([f for f in os.listdir(folder_path) if os.path.isfile(os.path.join(folder_path, f))])
-
-        if total_images == 0:
-            show_alert_dialog("Error", "No images found in the directory.")
-            progress_bar.visible = False
-            progress_text.visible = False
-            page.update()
-            return
-
-        processed_images = 0
-
-        for student_folder in os.listdir(IMAGE_DIR):
-            folder_path = os.path.join(IMAGE_DIR, student_folder)
-            if not os.path.isdir(folder_path):
-                continue
-
-            for filename in os.listdir(folder_path):
-                img_path = os.path.join(folder_path, filename)
-                img = cv2.imread(img_path)
-                if img is None:
-                    show_alert_dialog("Error", f"Could not load image {img_path}")
-                    continue
-
-                img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-                faces = face_recognition.face_encodings(img_rgb)
-
-                if faces:
-                    encode_list.append(faces[0])
-                    student_ids.append(student_folder)
-                else:
-                    show_alert_dialog("Error", f"No face found in {img_path}")
-
-                # Update progress
-                processed_images += 1
-                progress = processed_images / total_images
-                progress_bar.value = progress
-                progress_text.value = f"Training: {int(progress * 100)}%"
-                page.update()
-                await asyncio.sleep(0)  # Yield control to event loop
-
-        if not encode_list:
-            show_alert_dialog("Error", "No faces encoded.")
-            progress_bar.visible = False
-            progress_text.visible = False
-            page.update()
-            return
+        def report_progress(done, total):
+            progress = done / total
+            progress_bar.value = progress
+            progress_text.value = f"Training: {int(progress * 100)}% ({done}/{total} new images)"
+            ui.request()
 
         try:
-            with open(ENCODE_FILE, 'wb') as file:
-                pickle.dump((encode_list, student_ids), file)
-            show_alert_dialog("Success", f"Encoding complete. Total faces encoded: {len(encode_list)}")
+            # Encoding runs off the event loop so the page stays responsive
+            result = await asyncio.to_thread(face_trainer.train, IMAGE_DIR, ENCODE_FILE, on_progress=report_progress,
+                                           templates_per_student=TEMPLATES_PER_STUDENT)
+            if not result.encodings:
+                if result.removed:
+                    # The published gallery is now empty; drop the shared rows of the removed students too
+                    try:
+                        await asyncio.to_thread(embedding_sync.push_embeddings, [], [])
+                    except Exception as e:
+                        logging.error(f"Failed to push embeddings: {str(e)}")
+                show_alert_dialog("Error", "No faces encoded.")
+            else:
+                message = (f"Encoding complete. Total faces encoded: {result.faces} "
+                           f"({result.encoded} new or changed images, {result.reused} unchanged, {result.removed} removed)")
+                if len(result.encodings) != result.faces:
+                    message += f"\nGallery compacted to {len(result.encodings)} templates"
+                # Classroom PCs pull the changed students from the database
+                try:
+                    written, removed, skipped = await asyncio.to_thread(
+                        embedding_sync.push_embeddings, result.encodings, result.roll_numbers)
+                    message += f"\nShared with classroom PCs: {written} students updated, {removed} removed"
+                    if skipped:
+                        message += f" ({skipped} not in the student table)"
+                except Exception as e:
+                    logging.error(f"Failed to push embeddings: {str(e)}")
+                    message += f"\nCould not share encodings through the database: {str(e)}"
+                if result.encoded or result.removed:
+                    # Photos changed, so check for look-alike students and misfiled photos
+                    try:
+                        report = await asyncio.to_thread(gallery_report.run_report)
+                        message += (f"\nGallery check: {len(report['pairs'])} confusable student pairs, "
+                                    f"{len(report['outliers'])} suspicious photos (see {gallery_report.GALLERY_REPORT}.csv)")
+                    except Exception as e:
+                        logging.error(f"Gallery check failed: {str(e)}")
+                if result.problems:
+                    message += "\n\nSkipped:\n" + "\n".join(f"{path}: {problem}" for path, problem in result.problems[:10])
+                    if len(result.problems) > 10:
+                        message += f"\n... and {len(result.problems) - 10} more"
+                show_alert_dialog("Success", message)
         except Exception as e:
             show_alert_dialog("Error", f"Failed to save encodings: {str(e)}")
         finally:
             progress_bar.visible = False
             progress_text.visible = False
-            page.update()
+            ui.flush()
 
     def train_classifier(e):
         """Start the training process with a progress bar."""
@@ -0,0 +1,121 @@
+import argparse
+import os
+import time
+import logging
+from datetime import datetime
+import face_trainer
+import gallery_report
+import embedding_sync
+
+# Constants
+POLL_SECONDS = 30
+DEBOUNCE_SECONDS = 120  # Retrain once photos/ has been quiet this long, so a whole enrollment lands in one run
+RETRY_SECONDS = 600
+NICE = 10  # Watch mode yields the CPU to interactive work on POSIX systems
+
+def snapshot(image_dir):
+    """Cheap fingerprint of the photo tree: {key: (size, mtime_ns)}; no file contents are read."""
+    state = {}
+    for key, _, path in face_trainer.image_files(image_dir):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue  # Removed while listing
+        state[key] = (stat.st_size, stat.st_mtime_ns)
+    return state
+
+def parse_window(value):
+    """"HH:MM-HH:MM" -> (start, end) times; the window may wrap past midnight."""
+    start, end = value.split("-")
+    return datetime.strptime(start, "%H:%M").time(), datetime.strptime(end, "%H:%M").time()
+
+def in_window(window, now=None):
+    if window is None:
+        return True
+    now = (now or datetime.now()).time()
+    start, end = window
+    return start <= now < end if start <= end else now >= start or now < end
+
+def run_training(args):
+    last_percent = [-1]
+
+    def report_progress(done, total):
+        percent = int(100 * done / total)
+        if percent // 10 != last_percent[0] // 10:
+            print(f"  encoded {done}/{total} images ({percent}%)", flush=True)
+        last_percent[0] = percent
+
+    start = time.perf_counter()
+    result = face_trainer.train(args.photos, args.encode_file, args.manifest, on_progress=report_progress,
+                                workers=args.workers, templates_per_student=args.templates)
+    print(f"{datetime.now():%Y-%m-%d %H:%M:%S} gallery has {len(result.encodings)} rows from {result.faces} faces: "
+          f"{result.encoded} encoded, {result.reused} unchanged, {result.removed} removed "
+          f"in {time.perf_counter() - start:.1f}s", flush=True)
+    for path, problem in result.problems:
+        print(f"  skipped {path}: {problem}")
+    if (result.encodings or result.removed) and not args.no_push:
+        try:
+            written, removed, skipped = embedding_sync.push_embeddings(result.encodings, result.roll_numbers)
+            print(f"  database: {written} students written, {removed} removed, {skipped} not in the student table", flush=True)
+        except Exception as e:
+            logging.error(f"Failed to push embeddings: {str(e)}")  # Pushed again by the next run; unchanged rows are skipped
+    if (result.encoded or result.removed) and not args.no_report:
+        try:
+            report = gallery_report.run_report(args.manifest)
+            print(f"  gallery check: {len(report['pairs'])} confusable student pairs, {len(report['outliers'])} "
+                  f"suspicious photos in {report['seconds']:.1f}s (see {gallery_report.GALLERY_REPORT}.csv)", flush=True)
+        except Exception as e:
+            logging.error(f"Gallery check failed: {str(e)}")  # The new gallery is already published
+    return result
+
+def watch(args):
+    """Retrain whenever the photos change, after DEBOUNCE_SECONDS of quiet and only inside the window.
+
+    Running camera sessions load each published gallery in the background and swap it in between frames.
+    """
+    if hasattr(os, "nice"):
+        os.nice(NICE)
+    last = snapshot(args.photos)
+    pending_since = time.monotonic()  # Catch up on anything changed while the watcher was not running
+    print(f"Watching {args.photos} every {args.interval}s ({len(last)} images)", flush=True)
+    while True:
+        current = snapshot(args.photos)
+        if current != last:
+            last = current
+            pending_since = time.monotonic()  # Restart the quiet period on every change
+            logging.debug("Change detected in photos")
+        if pending_since is not None and time.monotonic() - pending_since >= args.debounce and in_window(args.window):
+            try:
+                run_training(args)
+                pending_since = None
+            except Exception as e:
+                logging.error(f"Training failed, retrying in {RETRY_SECONDS}s: {str(e)}")
+                pending_since = time.monotonic() + RETRY_SECONDS - args.debounce
+        time.sleep(args.interval)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the face gallery without the UI, once or whenever photos/ changes.")
+    parser.add_argument("--photos", default=face_trainer.IMAGE_DIR)
+    parser.add_argument("--encode-file", default=face_trainer.ENCODE_FILE)
+    parser.add_argument("--manifest", default=face_trainer.MANIFEST_FILE)
+    parser.add_argument("--workers", type=int, default=face_trainer.TRAIN_WORKERS)
+    parser.add_argument("--templates", type=int, default=face_trainer.TEMPLATES_PER_STUDENT,
+                        help="Compact each student to this many templates (1 = centroid)")
+    parser.add_argument("--no-push", action="store_true", help="Keep the gallery local instead of sharing it through the database")
+    parser.add_argument("--no-report", action="store_true", help="Skip the confusable-identity check after training")
+    parser.add_argument("--watch", action="store_true", help="Keep running and retrain when photos change")
+    parser.add_argument("--interval", type=float, default=POLL_SECONDS, help="Seconds between scans of the photos")
+    parser.add_argument("--debounce", type=float, default=DEBOUNCE_SECONDS, help="Quiet seconds before retraining")
+    parser.add_argument("--window", type=parse_window, help="Only retrain between these times, e.g. 22:00-06:00")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.INFO)
+
+    if not os.path.isdir(args.photos):
+        parser.error(f"Directory {args.photos} does not exist")
+    if args.watch:
+        try:
+            watch(args)
+        except KeyboardInterrupt:
+            pass
+    else:
+        run_training(args)
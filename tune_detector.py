@@ -0,0 +1,127 @@
+import argparse
+import os
+import time
+import logging
+import cv2
+from detector_profiles import PROFILES, DetectorProfile, save_profile, DETECTOR_PROFILE_FILE
+from face_tracker import iou
+from recognition_pipeline import detect_and_encode
+
+# Constants
+IMAGE_DIR = "photos"
+TARGET_RECALL = 0.95
+MAX_PHOTOS = 100
+CLIP_FRAMES = 30
+MATCH_IOU = 0.3  # A detection this close to a reference face counts as found
+
+# Slow but thorough settings whose detections stand in for ground truth on the recorded clip
+REFERENCE_PROFILE = DetectorProfile("reference", "hog", 2, 1.0, 1, "small")
+
+def sample_photos(image_dir, limit):
+    """Enrollment photos hold exactly one face each."""
+    paths = []
+    for student_folder in sorted(os.listdir(image_dir)):
+        folder_path = os.path.join(image_dir, student_folder)
+        if os.path.isdir(folder_path):
+            paths.extend(os.path.join(folder_path, f) for f in sorted(os.listdir(folder_path)))
+    step = max(1, len(paths) // limit)
+    frames = [cv2.imread(path) for path in paths[::step][:limit]]
+    return [frame for frame in frames if frame is not None]
+
+def sample_clip(path, count):
+    """count frames spread evenly over a recorded classroom clip."""
+    cap = cv2.VideoCapture(path)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    frames = []
+    for index in range(0, total, max(1, total // count)):
+        cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+        ret, frame = cap.read()
+        if ret:
+            frames.append(frame)
+        if len(frames) >= count:
+            break
+    cap.release()
+    return frames
+
+def run_profile(profile, frame):
+    """Detect and encode one frame as the camera loop would; returns (full-frame locations, seconds)."""
+    start = time.perf_counter()
+    small_frame = cv2.resize(frame, (0, 0), fx=profile.scale, fy=profile.scale) if profile.scale != 1.0 else frame
+    rgb_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+    locations, _ = detect_and_encode(rgb_frame, profile=profile)
+    seconds = time.perf_counter() - start
+    factor = 1.0 / profile.scale
+    return [tuple(int(round(v * factor)) for v in loc) for loc in locations], seconds
+
+def count_found(found, expected):
+    """Number of expected boxes matched one-to-one by a found box."""
+    unused = list(found)
+    hits = 0
+    for box in expected:
+        best = max(unused, key=lambda f: iou(f, box), default=None)
+        if best is not None and iou(best, box) >= MATCH_IOU:
+            unused.remove(best)
+            hits += 1
+    return hits
+
+def benchmark(profiles, photos, clip):
+    reference = [run_profile(REFERENCE_PROFILE, frame)[0] for frame in clip]
+    results = []
+    for profile in profiles:
+        run_profile(profile, (photos or clip)[0])  # Warm-up: model loading is not part of the timing
+        found = expected = 0
+        photo_seconds = clip_seconds = 0.0
+        for frame in photos:
+            locations, seconds = run_profile(profile, frame)
+            found += 1 if locations else 0
+            expected += 1
+            photo_seconds += seconds
+        for frame, reference_boxes in zip(clip, reference):
+            locations, seconds = run_profile(profile, frame)
+            found += count_found(locations, reference_boxes)
+            expected += len(reference_boxes)
+            clip_seconds += seconds
+        results.append({
+            "profile": profile,
+            "recall": found / expected if expected else 0.0,
+            # The clip is what the camera sees, so its timing decides when there is one
+            "ms_per_frame": 1000.0 * (clip_seconds / len(clip) if clip else photo_seconds / len(photos)),
+        })
+    return results
+
+def choose(results, target_recall):
+    """Fastest profile meeting the recall target, or the highest-recall one if none does."""
+    passing = [r for r in results if r["recall"] >= target_recall]
+    if passing:
+        return min(passing, key=lambda r: r["ms_per_frame"])
+    return max(results, key=lambda r: (r["recall"], -r["ms_per_frame"]))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pick the fastest face detector settings that meet a recall target on this machine.")
+    parser.add_argument("--photos", default=IMAGE_DIR, help="Enrollment photos directory")
+    parser.add_argument("--clip", help="Recorded classroom clip from this room's camera")
+    parser.add_argument("--target-recall", type=float, default=TARGET_RECALL)
+    parser.add_argument("--profiles", nargs="+", help="Only benchmark these profile names")
+    parser.add_argument("--no-save", action="store_true", help=f"Do not write {DETECTOR_PROFILE_FILE}")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    candidates = [p for p in PROFILES if not args.profiles or p.name in args.profiles]
+    photos = sample_photos(args.photos, MAX_PHOTOS) if os.path.isdir(args.photos) else []
+    clip = sample_clip(args.clip, CLIP_FRAMES) if args.clip else []
+    if not candidates or not (photos or clip):
+        parser.error("Need at least one profile and some photos or a clip to benchmark")
+
+    print(f"Benchmarking {len(candidates)} profiles on {len(photos)} photos and {len(clip)} clip frames")
+    results = benchmark(candidates, photos, clip)
+    print(f"{'profile':<14} {'model':<5} {'up':>3} {'scale':>6} {'jit':>4} {'marks':<6} {'recall':>7} {'ms/frame':>9}")
+    for r in results:
+        p = r["profile"]
+        print(f"{p.name:<14} {p.model:<5} {p.upsample:>3} {p.scale:>6.2f} {p.num_jitters:>4} {p.landmarks:<6} {r['recall']:>7.3f} {r['ms_per_frame']:>9.1f}")
+
+    best = choose(results, args.target_recall)
+    if best["recall"] < args.target_recall:
+        print(f"No profile reached recall {args.target_recall}; best was {best['recall']:.3f}")
+    print(f"Selected {best['profile'].name} ({best['ms_per_frame']:.1f} ms/frame, recall {best['recall']:.3f})")
+    if not args.no_save:
+        save_profile(best["profile"])
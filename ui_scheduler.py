@@ -0,0 +1,88 @@
+import threading
+import time
+import logging
+
+logging.basicConfig(level=logging.DEBUG, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Constants
+UI_FLUSH_INTERVAL_MS = 50  # At most one page.update() per interval, however many controls changed
+
+class UIUpdateScheduler:
+    """Coalesces page.update() calls for one Flet page.
+
+    Handlers mutate controls as usual and call request() instead of page.update(); every request in
+    the same interval is sent to the client as a single update. Delayed actions such as clearing a
+    status message go through call_later(), which replaces any pending action with the same key.
+    """
+
+    def __init__(self, page, interval_ms=UI_FLUSH_INTERVAL_MS):
+        self.page = page
+        self.interval = interval_ms / 1000.0
+        self.requested = 0
+        self.flushed = 0
+        self._lock = threading.Lock()
+        self._flush_timer = None
+        self._last_flush = 0.0
+        self._timers = {}
+
+    def request(self):
+        """Schedule a page update; returns immediately and never sends more than one per interval."""
+        with self._lock:
+            self.requested += 1
+            if self._flush_timer is not None:
+                return  # The pending flush will carry this change too
+            delay = max(0.0, self._last_flush + self.interval - time.monotonic())
+            self._flush_timer = threading.Timer(delay, self._flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def flush(self):
+        """Send pending changes now, e.g. before a long blocking step."""
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+        self._flush()
+
+    def call_later(self, key, delay, func):
+        """Run func after delay seconds and then request an update, superseding an earlier call with this key."""
+        def run():
+            with self._lock:
+                if self._timers.get(key) is not timer:
+                    return  # Superseded after it had already fired
+                del self._timers[key]
+            func()
+            self.request()
+
+        timer = threading.Timer(delay, run)
+        timer.daemon = True
+        with self._lock:
+            previous = self._timers.get(key)
+            if previous is not None:
+                previous.cancel()
+            self._timers[key] = timer
+        timer.start()
+
+    def cancel(self, key):
+        with self._lock:
+            timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+
+    def close(self):
+        """Cancel delayed actions and send whatever is still pending."""
+        with self._lock:
+            timers, self._timers = list(self._timers.values()), {}
+        for timer in timers:
+            timer.cancel()
+        self.flush()
+        logging.debug(f"UI scheduler closed: {self.requested} update requests sent as {self.flushed} page updates")
+
+    def _flush(self):
+        with self._lock:
+            self._flush_timer = None
+            self._last_flush = time.monotonic()
+            self.flushed += 1
+        try:
+            self.page.update()
+        except Exception as e:
+            logging.error(f"Failed to update page: {str(e)}")